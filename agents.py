@@ -1,73 +1,245 @@
-from pathlib import Path
+import time
+
 import numpy as np
-import joblib
 import pandas as pd
 
+from model_registry import REGISTRY
+from notes_index import NotesIndex
+from pareto import ParetoFrontier
+from tracing import span
+from scoring import CONSTRAINTS, PRED_COLUMNS, TARGETS, ConstraintCascade
+
 
 FEATURES = ["api_load","solvent_ratio","polymer_pct","surfactant_pct","ph","viscosity","process_temp","mix_time"]
 
+def sample_candidates(rng, size) -> np.ndarray:
+    X = np.empty((size, len(FEATURES)))
+    X[:, 0] = rng.uniform(0.1, 5.0, size)
+    X[:, 1] = rng.uniform(0.0, 1.0, size)
+    X[:, 2] = rng.uniform(0.0, 8.0, size)
+    X[:, 3] = rng.uniform(0.0, 3.0, size)
+    X[:, 4] = rng.uniform(4.0, 8.0, size)
+    X[:, 5] = rng.lognormal(mean=2.7, sigma=0.45, size=size)
+    X[:, 6] = rng.uniform(18, 45, size)
+    X[:, 7] = rng.uniform(2, 45, size)
+    return X
+
+def constraint_mask(P: np.ndarray, constraints) -> np.ndarray:
+    # P columns follow PRED_COLUMNS: permeability, irritation, stability, qc fail prob.
+    with span("constraint_filter", rows=len(P)) as sp:
+        keep = np.ones(len(P), dtype=bool)
+        for name, (key, op) in CONSTRAINTS.items():
+            if constraints and name in constraints:
+                keep &= op(P[:, TARGETS.index(key)], constraints[name])
+        sp.set(kept=int(keep.sum()))
+    return keep
+
+# d utility / d prediction, in PRED_COLUMNS order: 0.45 * perm/100 - 0.15 * irr
+# + 0.35 * stab/365 - 0.20 * fail. The surrogate optimizer's acquisition uses the same weights.
+UTILITY_WEIGHTS = np.array([0.45/100, -0.15, 0.35/365, -0.20])
+
+def utility(P: np.ndarray) -> np.ndarray:
+    return P @ UTILITY_WEIGHTS
+
+def top_n_indices(u: np.ndarray, n) -> np.ndarray:
+    # Positions of the n largest utilities, best first (ties keep their original order).
+    if 0 < n < len(u):
+        idx = np.argpartition(-u, n - 1)[:n]
+    else:
+        idx = np.arange(len(u))[:max(n, 0)]
+    return idx[np.lexsort((idx, -u[idx]))]
+
+# Chunk sizes of a time-budgeted search: the first chunk, and the smallest chunk worth
+# starting before the deadline.
+BUDGET_FIRST_CHUNK = 1024
+BUDGET_MIN_CHUNK = 256
+
+def proposal_frame(X: np.ndarray, P: np.ndarray, u: np.ndarray) -> pd.DataFrame:
+    order = np.argsort(-u, kind="stable")
+    top = pd.DataFrame(X[order], columns=FEATURES)
+    top[PRED_COLUMNS] = P[order]
+    top["utility"] = u[order]
+    top["proposal_id"] = [f"PROP-{i:03d}" for i in range(1, len(top)+1)]
+    return top
+
 class FormulationIntelligenceAgent:
-    def __init__(self, model_dir=None):
-        if model_dir is None:
-            model_dir = Path(__file__).resolve().parent / "models"
-        else:
-            model_dir = Path(model_dir)
-        self.m_perm = joblib.load(f"{model_dir}/model_perm.joblib")
-        self.m_irr  = joblib.load(f"{model_dir}/model_irr.joblib")
-        self.m_stab = joblib.load(f"{model_dir}/model_stab.joblib")
-        self.m_fail = joblib.load(f"{model_dir}/model_fail.joblib")
+    def __init__(self, model_dir=None, registry=None):
+        registry = REGISTRY if registry is None else registry
+        self.models = registry.get(model_dir)
+        self.scorer = self.models.scorer
+
+    # Each forest is loaded by the registry on first access.
+    m_perm = property(lambda self: self.models["perm"])
+    m_irr = property(lambda self: self.models["irr"])
+    m_stab = property(lambda self: self.models["stab"])
+    m_fail = property(lambda self: self.models["fail"])
+
+    def score_array(self, X: np.ndarray, out=None) -> np.ndarray:
+        # X holds FEATURES in column order; returns an (n, 4) block in PRED_COLUMNS order.
+        return self.scorer.score_array(X, out=out)
 
     def score(self, X: pd.DataFrame) -> pd.DataFrame:
-        Xf = X[FEATURES]
-        out = X.copy()
-        out["pred_permeability"] = self.m_perm.predict(Xf)
-        out["pred_irritation"]   = np.clip(self.m_irr.predict(Xf), 0, 1)
-        out["pred_stability"]    = np.clip(self.m_stab.predict(Xf), 15, 365)
-        out["pred_qc_fail_prob"] = self.m_fail.predict_proba(Xf)[:,1]
-        return out
-
-    def propose_next_experiments(self, n=10, seed=7, constraints=None):
+        with span("score", rows=len(X)):
+            preds = self.score_array(X[FEATURES].to_numpy(dtype=np.float32))
+            if X.columns.isin(PRED_COLUMNS).any():
+                return X.assign(**dict(zip(PRED_COLUMNS, preds.T)))
+            return pd.concat([X, pd.DataFrame(preds, index=X.index, columns=PRED_COLUMNS)], axis=1)
+
+    def propose_next_experiments(self, n=10, seed=7, constraints=None,
+                                 n_candidates=600, chunk_size=65536, time_budget=None,
+                                 strategy="random"):
+        with span("propose", strategy=strategy, n=n) as sp:
+            result = self._propose(n, seed, constraints, n_candidates, chunk_size, time_budget, strategy)
+            sp.set(rows=self.last_search["candidates"])
+            return result
+
+    def _propose(self, n, seed, constraints, n_candidates, chunk_size, time_budget, strategy):
+        # Candidates are drawn and scored chunk by chunk; only the running top-n survives
+        # between chunks, so memory is bounded by chunk_size. The draw sequence depends on
+        # chunk_size, so results are reproducible for a fixed (seed, chunk_size).
+        # With a time_budget (seconds) the chunks start at BUDGET_FIRST_CHUNK rows and grow
+        # from the measured rows/sec, up to chunk_size, and no chunk is started that would
+        # run past the deadline; chunk sizes then follow the timings and results are not
+        # reproducible. n_candidates=None searches until time_budget is spent.
+        # strategy="surrogate" spends the n_candidates budget in optimizer.SurrogateOptimizer.
+        if strategy == "surrogate":
+            from optimizer import SurrogateOptimizer
+            return SurrogateOptimizer(self).run(n=n, seed=seed, constraints=constraints, n_candidates=n_candidates)
+        # strategy="pareto" keeps the non-dominated set of every chunk instead of a top-n and
+        # returns the whole frontier ranked by utility; n is not applied.
+        if strategy not in ("random", "pareto"):
+            raise ValueError(f"unknown strategy: {strategy!r}")
+        if n_candidates is None and time_budget is None:
+            raise ValueError("either n_candidates or time_budget must be set")
         rng = np.random.default_rng(seed)
-        candidates = pd.DataFrame({
-            "api_load": rng.uniform(0.1, 5.0, 600),
-            "solvent_ratio": rng.uniform(0.0, 1.0, 600),
-            "polymer_pct": rng.uniform(0.0, 8.0, 600),
-            "surfactant_pct": rng.uniform(0.0, 3.0, 600),
-            "ph": rng.uniform(4.0, 8.0, 600),
-            "viscosity": rng.lognormal(mean=2.7, sigma=0.45, size=600),
-            "process_temp": rng.uniform(18, 45, 600),
-            "mix_time": rng.uniform(2, 45, 600),
-        })
-        scored = self.score(candidates)
-
-        if constraints:
-            if "max_irritation" in constraints:
-                scored = scored[scored["pred_irritation"] <= constraints["max_irritation"]]
-            if "min_stability" in constraints:
-                scored = scored[scored["pred_stability"] >= constraints["min_stability"]]
-            if "max_fail_prob" in constraints:
-                scored = scored[scored["pred_qc_fail_prob"] <= constraints["max_fail_prob"]]
-
-        scored["utility"] = (
-            0.45*(scored["pred_permeability"]/100) +
-            0.35*(scored["pred_stability"]/365) -
-            0.15*(scored["pred_irritation"]) -
-            0.20*(scored["pred_qc_fail_prob"])
-        )
-        top = scored.sort_values("utility", ascending=False).head(n).reset_index(drop=True)
-        top["proposal_id"] = [f"PROP-{i:03d}" for i in range(1, len(top)+1)]
-        return top
+        t0 = time.perf_counter()
+        remaining = np.inf if n_candidates is None else int(n_candidates)
+        buf = np.empty((int(min(chunk_size, remaining)), len(PRED_COLUMNS)))
+        best_X = np.empty((0, len(FEATURES)))
+        best_P = np.empty((0, len(PRED_COLUMNS)))
+        best_u = np.empty(0)
+        searched = feasible = chunks = 0
+        cascade = None
+        frontier = ParetoFrontier(len(FEATURES)) if strategy == "pareto" else None
+        if constraints and any(name in constraints for name in CONSTRAINTS):
+            cascade = ConstraintCascade(self.scorer, constraints)
+
+        size_cap = chunk_size if time_budget is None else min(chunk_size, BUDGET_FIRST_CHUNK)
+        while remaining > 0:
+            size = int(min(size_cap, remaining))
+            t_chunk = time.perf_counter()
+            X = sample_candidates(rng, size)
+            if cascade is None:
+                P = self.score_array(X, out=buf[:size])
+                keep = constraint_mask(P, constraints)
+            else:
+                P = buf[:size]
+                keep = cascade.run(X, out=P)
+            X, P = X[keep], P[keep]
+
+            if frontier is not None:
+                frontier.update(X, P)
+            else:
+                u = utility(P)
+                best_X = np.concatenate([best_X, X])
+                best_P = np.concatenate([best_P, P])
+                best_u = np.concatenate([best_u, u])
+                if len(best_u) > n:
+                    idx = np.argpartition(-best_u, n - 1)[:n]
+                    best_X, best_P, best_u = best_X[idx], best_P[idx], best_u[idx]
+
+            remaining -= size
+            searched += size
+            feasible += len(P)
+            chunks += 1
+            if time_budget is not None:
+                now = time.perf_counter()
+                # Rows that still fit before the deadline at the last chunk's rate.
+                fit = size / max(now - t_chunk, 1e-9) * (time_budget - (now - t0))
+                size_cap = int(min(chunk_size, 4 * size, fit))
+                if size_cap < BUDGET_MIN_CHUNK:
+                    break
+
+        if frontier is not None:
+            best_X, best_P = frontier.X, frontier.P
+            best_u = utility(best_P)
+        self.last_search = {
+            "strategy": strategy,
+            "candidates": searched,
+            "feasible": feasible,
+            "chunks": chunks,
+            "seconds": time.perf_counter() - t0,
+            "cascade": cascade.report() if cascade is not None else None,
+            "frontier": len(frontier) if frontier is not None else None,
+        }
+        return proposal_frame(best_X, best_P, best_u)
 
 class EvidenceReadinessAgent:
-    def build_evidence_pack(self, formulations_df, dev_notes_df, top_n=12):
-        notes = dev_notes_df.groupby("exp_id")["observation"].apply(lambda x: " ".join(list(x))).reset_index()
-        merged = formulations_df.merge(notes, on="exp_id", how="left")
-        merged["observation"] = merged["observation"].fillna("No notes.")
-        merged["priority"] = (
-            0.35*(merged["irritation_risk"]) +
-            0.35*(1 - merged["stability_days"]/365) +
-            0.30*(merged["qc_fail"])
+    PACK_COLUMNS = ["exp_id", "irritation_risk", "stability_days", "qc_fail"]
+
+    def __init__(self):
+        self._index_src = None
+        self._index = None
+
+    def notes_index(self, dev_notes_df) -> NotesIndex:
+        # Built once per notes frame and reused while the same frame is passed in.
+        if isinstance(dev_notes_df, NotesIndex):
+            return dev_notes_df
+        if self._index_src is not dev_notes_df:
+            self._index = NotesIndex(dev_notes_df)
+            self._index_src = dev_notes_df
+        return self._index
+
+    def build_evidence_pack_from_store(self, store, top_n=12, review_status=None, exp_range=None,
+                                       restrict=None, boost=None, boost_weight=0.25):
+        # Reads only the columns the pack uses; review_status / exp_range are pushed down
+        # to the Parquet scan.
+        formulations_df = store.read("formulations", columns=self.PACK_COLUMNS, exp_range=exp_range)
+        note_columns = ["exp_id", "observation"]
+        if restrict or boost:
+            note_columns += ["note_id", "review_status"]
+        dev_notes_df = store.read("dev_notes", columns=note_columns,
+                                  review_status=review_status, exp_range=exp_range)
+        pack = self.build_evidence_pack(formulations_df, dev_notes_df, top_n=top_n,
+                                        restrict=restrict, boost=boost, boost_weight=boost_weight)
+        # The other formulation columns are read back for the top_n rows only, so the pack
+        # has the same columns as one built from the full table.
+        import pyarrow.dataset as ds
+        rest = store.read("formulations", filter=ds.field("exp_id").isin(pack["exp_id"].tolist()))
+        columns = list(rest.columns) + [c for c in pack.columns if c not in rest.columns]
+        return pack.merge(rest.drop(columns=self.PACK_COLUMNS[1:]), on="exp_id", how="left")[columns]
+
+    def build_evidence_pack(self, formulations_df, dev_notes_df, top_n=12,
+                            restrict=None, boost=None, boost_weight=0.25):
+        # dev_notes_df may also be a prebuilt NotesIndex. Priority is computed on arrays,
+        # the top_n rows are picked with argpartition, and only those rows are joined to
+        # their notes. restrict / boost are NotesIndex.query filters, e.g.
+        # {"terms": "QC out-of-spec", "status": "approved"}: restrict keeps only experiments
+        # with a matching note, boost adds boost_weight to their priority.
+        with span("build_evidence_pack", rows=len(formulations_df), top_n=top_n):
+            return self._build_evidence_pack(formulations_df, dev_notes_df, top_n,
+                                             restrict, boost, boost_weight)
+
+    def _build_evidence_pack(self, formulations_df, dev_notes_df, top_n, restrict, boost, boost_weight):
+        index = self.notes_index(dev_notes_df)
+        priority = (
+            0.35*(formulations_df["irritation_risk"].to_numpy()) +
+            0.35*(1 - formulations_df["stability_days"].to_numpy()/365) +
+            0.30*(formulations_df["qc_fail"].to_numpy())
         )
-        pack = merged.sort_values("priority", ascending=False).head(top_n).reset_index(drop=True)
-        pack["trace"] = pack["exp_id"].apply(lambda x: f"Data row exp_id={x}")
+        if restrict or boost:
+            exp_ids = formulations_df["exp_id"].to_numpy(dtype=object).astype(str)
+        if boost:
+            priority = priority + boost_weight * np.isin(exp_ids, index.experiments(**boost).astype(str))
+        if restrict:
+            rows = np.flatnonzero(np.isin(exp_ids, index.experiments(**restrict).astype(str)))
+            formulations_df, priority = formulations_df.iloc[rows], priority[rows]
+        k = min(top_n, len(priority))
+        sel = np.argpartition(-priority, k - 1)[:k] if 0 < k < len(priority) else np.arange(len(priority))
+        sel = sel[np.lexsort((sel, -priority[sel]))][:k]
+
+        pack = formulations_df.iloc[sel].reset_index(drop=True)
+        pack["observation"] = index.lookup(pack["exp_id"], default="No notes.")
+        pack["priority"] = priority[sel]
+        pack["trace"] = "Data row exp_id=" + pack["exp_id"].astype(str)
         return pack
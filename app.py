@@ -1,12 +1,14 @@
 import os
 
-import pandas as pd
 import streamlit as st
 
-from agents import EvidenceReadinessAgent, FormulationIntelligenceAgent
-from authoring import render_evidence_pack_md, render_formulation_recs_md
-from data_gen import generate_synthetic_dev_notes, generate_synthetic_formulation_data
-from orchestrator import orchestrate
+import startup
+import tracing
+
+# Heavy imports, data preparation and model loading run on a background thread while the
+# login gate is showing (set AGENTIC_PRELOAD=0 to do them on demand instead).
+startup.start()
+st.set_page_config(page_title="Agentic R&D Topical Demo", layout="wide")
 
 
 # -----------------------------------------------------------------------------
@@ -32,15 +34,26 @@ def login_gate() -> None:
             else:
                 st.error("Invalid password")
 
+        startup.mark("first_paint")
         st.stop()  # Critical: stops rest of app from running
 
 
 login_gate()
 
+import altair as alt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from agents import EvidenceReadinessAgent, FormulationIntelligenceAgent  # noqa: E402
+from authoring import render_evidence_pack_md, render_formulation_recs_md  # noqa: E402
+from model_registry import REGISTRY  # noqa: E402
+from notes_index import NotesIndex  # noqa: E402
+from orchestrator import orchestrate, orchestrate_many  # noqa: E402
+from pool_cache import ScoredPoolCache  # noqa: E402
+from sensitivity import FEATURE_RANGES, SensitivitySweeper  # noqa: E402
+
 # -----------------------------------------------------------------------------
 # App Shell
 # -----------------------------------------------------------------------------
-st.set_page_config(page_title="Agentic R&D Topical Demo", layout="wide")
 
 # ---------------------------
 # Guided Demo Sidebar
@@ -68,6 +81,19 @@ elif demo_step == "Orchestration (Shadow)":
 st.sidebar.markdown("---")
 st.sidebar.write("This guided mode ensures consistent demos across audiences.")
 
+with st.sidebar.expander("Model cache"):
+    reg = REGISTRY.stats()
+    st.write(
+        f"Loads: {reg['load_count']} ({reg['load_seconds']:.2f}s total) · "
+        f"cache hits: {reg['cache_hits']} · RSS: {reg['rss_bytes'] / 2**20:.0f} MiB"
+    )
+
+diagnostics = st.sidebar.checkbox("Diagnostics", help="Time the model, scoring and rendering steps of each rerun.")
+# Spans are collected on this rerun's thread only; other sessions keep tracing off.
+tracing.stop_captures()
+if diagnostics:
+    trace_capture = tracing.start_capture()
+
 # ---------------------------
 
 st.title("Agentic AI Validation Demo — Topical Product R&D (Synthetic Data)")
@@ -81,12 +107,27 @@ st.caption(
 # -----------------------------------------------------------------------------
 @st.cache_data
 def load_or_make_data() -> tuple[pd.DataFrame, pd.DataFrame]:
-    df = generate_synthetic_formulation_data(n=1200, seed=7)
-    notes = generate_synthetic_dev_notes(df, n_notes=200, seed=11)
-    return df, notes
+    # Seeds the store from data_gen on first start; usually already done by the preload thread.
+    return startup.wait("data")
+
+
+@st.cache_resource
+def get_pool_cache() -> ScoredPoolCache:
+    # Shared across sessions: slider changes re-filter a cached scored pool.
+    return startup.wait("pool_cache")
+
 
+@st.cache_resource
+def get_sweeper() -> SensitivitySweeper:
+    return SensitivitySweeper()
 
-df, notes = load_or_make_data()
+
+@st.cache_resource
+def get_notes_index() -> NotesIndex:
+    return startup.wait("notes_index")
+
+
+df, _ = load_or_make_data()
 
 
 # -----------------------------------------------------------------------------
@@ -208,17 +249,25 @@ with tabs[2]:
         ["balanced", "speed_to_clinic", "low_risk"],
     )
 
-    agent = FormulationIntelligenceAgent()
-    proposals = agent.propose_next_experiments(
-        n=12,
-        constraints={
-            "max_irritation": max_irr,
-            "min_stability": min_stab,
-            "max_fail_prob": max_fail,
-        },
+    pareto_only = st.checkbox(
+        "Pareto frontier only (rank the non-dominated trade-off set instead of the top 12)",
+        value=False,
     )
 
+    agent = FormulationIntelligenceAgent()
+    constraints = {
+        "max_irritation": max_irr,
+        "min_stability": min_stab,
+        "max_fail_prob": max_fail,
+    }
+    if pareto_only:
+        proposals = get_pool_cache().frontier(agent, constraints=constraints)
+        st.caption(f"{len(proposals)} feasible candidates are Pareto-optimal.")
+    else:
+        proposals = get_pool_cache().propose(agent, n=12, constraints=constraints)
+
     ranked = orchestrate(proposals, policy=policy)
+    startup.mark("first_recommendation")
 
     st.markdown("### Ranked recommendations")
     st.dataframe(
@@ -250,6 +299,40 @@ with tabs[2]:
         file_name=f"summary_{policy}.md",
     )
 
+    with st.expander("What-if sensitivity"):
+        w1, w2, w3 = st.columns(3)
+        with w1:
+            sweep_ids = st.multiselect(
+                "Proposals", list(ranked["proposal_id"]), default=list(ranked["proposal_id"][:1])
+            )
+        with w2:
+            sweep_features = st.multiselect(
+                "Vary one or two features", list(FEATURE_RANGES), default=["ph"], max_selections=2
+            )
+        with w3:
+            sweep_target = st.selectbox(
+                "Prediction",
+                ["pred_permeability", "pred_irritation", "pred_stability", "pred_qc_fail_prob"],
+            )
+            resolution = st.slider("Grid points per feature", 10, 100, 50, 10)
+
+        if sweep_ids and sweep_features:
+            bases = ranked.set_index("proposal_id").loc[sweep_ids]
+            sweep = get_sweeper().sweep(agent, bases, sweep_features, resolution=resolution)
+            grid = sweep.frame(labels=sweep_ids).rename(columns={"base": "proposal_id"})
+            if len(sweep_features) == 1:
+                chart = alt.Chart(grid).mark_line().encode(
+                    x=sweep_features[0], y=sweep_target, color="proposal_id"
+                )
+            else:
+                chart = alt.Chart(grid).mark_rect().encode(
+                    x=alt.X(f"{sweep_features[0]}:Q", bin=alt.Bin(maxbins=resolution)),
+                    y=alt.Y(f"{sweep_features[1]}:Q", bin=alt.Bin(maxbins=resolution)),
+                    color=f"mean({sweep_target}):Q",
+                    facet=alt.Facet("proposal_id", columns=3),
+                )
+            st.altair_chart(chart, use_container_width=True)
+
 
 # -----------------------------------------------------------------------------
 # Tab 3 — Workstream B
@@ -263,8 +346,30 @@ with tabs[3]:
 
     top_n = st.slider("Evidence pack size", 5, 25, 12, 1)
 
+    n1, n2, n3 = st.columns(3)
+    with n1:
+        note_terms = st.text_input("Notes mentioning (keywords)", "", placeholder="e.g. QC out-of-spec")
+    with n2:
+        note_status = st.multiselect("Note review status", sorted(s for s in get_notes_index().statuses if isinstance(s, str)))
+    with n3:
+        note_mode = st.radio("Use matching notes to", ["boost", "restrict"], horizontal=True)
+
+    note_filter = {}
+    if note_terms.strip():
+        note_filter["terms"] = note_terms
+    if note_status:
+        note_filter["status"] = note_status
+
     ev = EvidenceReadinessAgent()
-    pack = ev.build_evidence_pack(df, notes, top_n=top_n)
+    pack = ev.build_evidence_pack(
+        df,
+        get_notes_index(),
+        top_n=top_n,
+        restrict=note_filter if note_mode == "restrict" else None,
+        boost=note_filter if note_mode == "boost" else None,
+    )
+    if note_filter:
+        st.caption(f"{len(get_notes_index().experiments(**note_filter))} experiments have matching notes.")
 
     st.markdown("### Evidence pack (traceable)")
     st.dataframe(
@@ -298,7 +403,7 @@ with tabs[4]:
     st.info("This view is intentionally limited to highlight trade-off governance and coordination.")
 
     agent = FormulationIntelligenceAgent()
-    proposals = agent.propose_next_experiments(n=12)
+    proposals = get_pool_cache().propose(agent, n=12)
 
     colA, colB = st.columns(2)
 
@@ -308,8 +413,15 @@ with tabs[4]:
     with colB:
         pol2 = st.selectbox("Policy B", ["balanced", "speed_to_clinic", "low_risk"], index=2)
 
-    r1 = orchestrate(proposals, policy=pol1).head(8)
-    r2 = orchestrate(proposals, policy=pol2).head(8)
+    comparison = orchestrate_many(proposals, {"A": pol1, "B": pol2}, reference="A")
+    r1 = comparison.ranking("A", top=8)
+    r2 = comparison.ranking("B", top=8)
+    shift = comparison.stats(top_k=8).loc["B"]
+
+    s1, s2, s3 = st.columns(3)
+    s1.metric("Kendall tau (A vs B)", f"{shift['kendall_tau']:.2f}")
+    s2.metric("Top-8 overlap", f"{shift['top_8_overlap']:.0%}")
+    s3.metric("Largest rank move", int(shift["max_abs_shift"]))
 
     left, right = st.columns(2)
 
@@ -344,3 +456,30 @@ with tabs[4]:
             ],
             use_container_width=True,
         )
+
+    st.markdown(f"### Largest rank movers — {pol2} vs {pol1}")
+    st.dataframe(
+        comparison.movers(n=5).query("policy == 'B'").drop(columns="policy"),
+        use_container_width=True,
+    )
+
+# -----------------------------------------------------------------------------
+# Diagnostics
+# -----------------------------------------------------------------------------
+if diagnostics:
+    spans = pd.DataFrame(tracing.stop_capture(trace_capture), columns=["name", "ms", "rows"])
+    with st.sidebar.expander("Diagnostics — this rerun", expanded=True):
+        if spans.empty:
+            st.write("No instrumented calls ran (results came from cache).")
+        else:
+            st.dataframe(
+                spans.groupby("name", sort=False)
+                .agg(calls=("ms", "size"), total_ms=("ms", "sum"), rows=("rows", "max"))
+                .sort_values("total_ms", ascending=False)
+                .round(1),
+                use_container_width=True,
+            )
+
+with st.sidebar.expander("Startup timings"):
+    st.caption("Seconds since this server process started serving the app.")
+    st.dataframe(pd.DataFrame(startup.phases()).round(3), use_container_width=True)
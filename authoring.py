@@ -1,38 +1,168 @@
+import io
+import zipfile
 from datetime import date
+from pathlib import Path
 
-def render_evidence_pack_md(evidence_pack_df, title="Development Readiness Evidence Pack"):
-    lines = []
-    lines.append(f"# {title}")
-    lines.append(f"Date: {date.today().isoformat()}\n")
-    lines.append("## Summary")
-    lines.append("This pack summarizes high-priority development signals and links each statement to an underlying experiment record.\n")
-    for i, r in evidence_pack_df.iterrows():
-        lines.append(f"### {i+1}. {r['exp_id']}")
-        lines.append(f"- Stability days: **{r['stability_days']:.0f}**")
-        lines.append(f"- Irritation risk: **{r['irritation_risk']:.2f}**")
-        lines.append(f"- QC fail: **{int(r['qc_fail'])}**")
-        lines.append(f"- Observation: {r['observation']}")
-        lines.append(f"- Trace: `{r['trace']}`\n")
-    lines.append("## Governance Notes")
-    lines.append("- Decision-support output only; scientific judgment remains with the R&D team.")
-    lines.append("- No regulatory submission artifacts are generated; this supports readiness and cross-functional handoff quality.")
-    return "\n".join(lines)
-
-def render_formulation_recs_md(ranked_df, policy="balanced", top_k=5):
+import numpy as np
+
+from tracing import span, traced
+
+EVIDENCE_PACK_TITLE = "Development Readiness Evidence Pack"
+
+
+def _fmt(values, spec) -> np.ndarray:
+    # f"{v:{spec}}" for every value of a numeric column, as an object array of str.
+    return np.char.mod(f"%{spec}", np.asarray(values, dtype=np.float64)).astype(object)
+
+
+def _text(values) -> np.ndarray:
+    # f"{v}" for every value.
+    return np.asarray(values, dtype=object).astype(str).astype(object)
+
+
+def _write_lines(fh, head, blocks, tail) -> None:
+    # Writes "\n".join(head + rows + tail) with each block of rows formatted and written
+    # separately. A block is a list of equally long object arrays, one per line of a row.
+    fh.write("\n".join(head))
+    for block in blocks:
+        if len(block[0]):
+            fh.write("\n")
+            fh.write("\n".join(np.column_stack(block).ravel()))
+    fh.write("\n")
+    fh.write("\n".join(tail))
+
+
+def _row_chunks(n, chunk_rows):
+    return (slice(start, min(start + chunk_rows, n)) for start in range(0, n, chunk_rows))
+
+
+def write_evidence_pack_md(fh, evidence_pack_df, title=EVIDENCE_PACK_TITLE, today=None, chunk_rows=4096) -> None:
+    # Streams render_evidence_pack_md's output to a text handle, chunk_rows rows at a time.
+    today = today or date.today()
+    df = evidence_pack_df
+    number = np.asarray(df.index) + 1
+    cols = {c: df[c].to_numpy() for c in ["exp_id", "stability_days", "irritation_risk", "qc_fail",
+                                          "observation", "trace"]}
+    blocks = (
+        [
+            "### " + _text(number[s]) + ". " + _text(cols["exp_id"][s]),
+            "- Stability days: **" + _fmt(cols["stability_days"][s], ".0f") + "**",
+            "- Irritation risk: **" + _fmt(cols["irritation_risk"][s], ".2f") + "**",
+            "- QC fail: **" + _text(np.asarray(cols["qc_fail"][s]).astype(np.int64)) + "**",
+            "- Observation: " + _text(cols["observation"][s]),
+            "- Trace: `" + _text(cols["trace"][s]) + "`\n",
+        ]
+        for s in _row_chunks(len(df), chunk_rows)
+    )
+    _write_lines(fh, [
+        f"# {title}",
+        f"Date: {today.isoformat()}\n",
+        "## Summary",
+        "This pack summarizes high-priority development signals and links each statement to an underlying experiment record.\n",
+    ], blocks, [
+        "## Governance Notes",
+        "- Decision-support output only; scientific judgment remains with the R&D team.",
+        "- No regulatory submission artifacts are generated; this supports readiness and cross-functional handoff quality.",
+    ])
+
+
+def write_formulation_recs_md(fh, ranked_df, policy="balanced", top_k=5, today=None, chunk_rows=4096) -> None:
+    # Streams render_formulation_recs_md's output to a text handle, chunk_rows rows at a time.
+    today = today or date.today()
     top = ranked_df.head(top_k)
-    lines = []
-    lines.append(f"# Formulation Recommendations ({policy})")
-    lines.append(f"Date: {date.today().isoformat()}\n")
-    lines.append("## Recommended next experiments (decision-support)")
-    for _, r in top.iterrows():
-        pid = r.get("proposal_id","(no_id)")
-        lines.append(f"### {pid}")
-        lines.append(f"- Pred permeability: **{r['pred_permeability']:.1f}** (0–100)")
-        lines.append(f"- Pred irritation: **{r['pred_irritation']:.2f}** (0–1)")
-        lines.append(f"- Pred stability: **{r['pred_stability']:.0f} days**")
-        lines.append(f"- Pred QC fail prob: **{r['pred_qc_fail_prob']:.2f}**")
-        lines.append(f"- Trace: derived from row `{pid}` in proposal set\n")
-    lines.append("## Governance Notes")
-    lines.append("- Advisory only; final selection remains with the R&D team.")
-    lines.append("- During POC, validate outputs against wet-lab results in shadow-mode.")
-    return "\n".join(lines)
+    pid = top["proposal_id"].to_numpy() if "proposal_id" in top else np.full(len(top), "(no_id)", dtype=object)
+    cols = {c: top[c].to_numpy() for c in ["pred_permeability", "pred_irritation", "pred_stability",
+                                           "pred_qc_fail_prob"]}
+    blocks = (
+        [
+            "### " + _text(pid[s]),
+            "- Pred permeability: **" + _fmt(cols["pred_permeability"][s], ".1f") + "** (0–100)",
+            "- Pred irritation: **" + _fmt(cols["pred_irritation"][s], ".2f") + "** (0–1)",
+            "- Pred stability: **" + _fmt(cols["pred_stability"][s], ".0f") + " days**",
+            "- Pred QC fail prob: **" + _fmt(cols["pred_qc_fail_prob"][s], ".2f") + "**",
+            "- Trace: derived from row `" + _text(pid[s]) + "` in proposal set\n",
+        ]
+        for s in _row_chunks(len(top), chunk_rows)
+    )
+    _write_lines(fh, [
+        f"# Formulation Recommendations ({policy})",
+        f"Date: {today.isoformat()}\n",
+        "## Recommended next experiments (decision-support)",
+    ], blocks, [
+        "## Governance Notes",
+        "- Advisory only; final selection remains with the R&D team.",
+        "- During POC, validate outputs against wet-lab results in shadow-mode.",
+    ])
+
+
+@traced("render_evidence_pack_md")
+def render_evidence_pack_md(evidence_pack_df, title=EVIDENCE_PACK_TITLE, today=None):
+    buf = io.StringIO()
+    write_evidence_pack_md(buf, evidence_pack_df, title, today)
+    return buf.getvalue()
+
+
+@traced("render_formulation_recs_md")
+def render_formulation_recs_md(ranked_df, policy="balanced", top_k=5, today=None):
+    buf = io.StringIO()
+    write_formulation_recs_md(buf, ranked_df, policy, top_k, today)
+    return buf.getvalue()
+
+
+class ReportSink:
+    """Destination for bulk-rendered reports: a directory, or a zip archive for a ``.zip`` path.
+
+    ``open(name)`` returns a UTF-8 text handle for one report; zip members are compressed
+    as they are written, so no report is held in memory as a whole.
+    """
+
+    def __init__(self, target):
+        self.target = Path(target)
+        self.zip = None
+        if self.target.suffix == ".zip":
+            self.target.parent.mkdir(parents=True, exist_ok=True)
+            self.zip = zipfile.ZipFile(self.target, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self.target.mkdir(parents=True, exist_ok=True)
+        self.names = []
+
+    def open(self, name):
+        self.names.append(name)
+        if self.zip is not None:
+            return io.TextIOWrapper(self.zip.open(name, "w"), encoding="utf-8", newline="")
+        return open(self.target / name, "w", encoding="utf-8", newline="")
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _render_many(kind, items, target, write, today):
+    today = today or date.today()
+    with span(kind, reports=len(items)), ReportSink(target) as sink:
+        for name, args in items.items():
+            with sink.open(name) as fh:
+                write(fh, *args, today=today)
+        return sink.names
+
+
+def render_evidence_packs(packs, target, title=EVIDENCE_PACK_TITLE, today=None) -> list:
+    # packs: name -> evidence pack frame; writes <name>.md for each into target (a
+    # directory or .zip) with one shared date. Returns the written report names.
+    items = {f"{name}.md": (pack, title) for name, pack in packs.items()}
+    return _render_many("render_evidence_packs", items, target, write_evidence_pack_md, today)
+
+
+def render_policy_summaries(rankings, target, top_k=5, today=None) -> list:
+    # rankings: policy -> ranked frame, or an orchestrator.PolicyComparison (every policy is
+    # rendered from its top_k ranking). Writes summary_<policy>.md for each into target.
+    if hasattr(rankings, "ranking"):
+        rankings = {policy: rankings.ranking(policy, top=top_k) for policy in rankings.names}
+    items = {f"summary_{policy}.md": (ranked, policy, top_k) for policy, ranked in rankings.items()}
+    return _render_many("render_policy_summaries", items, target, write_formulation_recs_md, today)
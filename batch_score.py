@@ -0,0 +1,110 @@
+"""Out-of-core batch scoring of large candidate files.
+
+    python batch_score.py candidates.parquet scored/ --model-dir models --chunk-size 200000 --workers 8
+
+The input (CSV or Parquet) is streamed in chunks. Chunks are scored in a process pool and
+each one is written to ``OUT_DIR/part-NNNNNN.parquet`` as soon as it is done. Rerunning the
+same command after an interruption skips the parts that already exist.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from agents import FormulationIntelligenceAgent
+from model_registry import REGISTRY
+
+_AGENT = None
+
+
+def _init_worker(model_dir):
+    # With fork the registry cache is inherited from the parent, so the forests are shared
+    # copy-on-write; with spawn they are loaded once per worker through the registry.
+    global _AGENT
+    _AGENT = FormulationIntelligenceAgent(model_dir)
+    _AGENT.scorer.n_jobs = 1
+
+
+def _score_chunk(i, chunk, out_dir):
+    t0 = time.perf_counter()
+    scored = _AGENT.score(chunk)
+    path = Path(out_dir) / f"part-{i:06d}.parquet"
+    tmp = path.with_name(f".{path.name}.tmp")
+    pq.write_table(pa.Table.from_pandas(scored, preserve_index=False), tmp)
+    os.replace(tmp, path)
+    return i, len(chunk), time.perf_counter() - t0
+
+
+def iter_chunks(path, chunk_size):
+    # Chunk boundaries depend only on the input and chunk_size, which is what makes
+    # resuming by part number safe.
+    path = Path(path)
+    if path.suffix in (".parquet", ".pq") or path.is_dir():
+        for batch in ds.dataset(path, format="parquet").to_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def batch_score(input_path, out_dir, model_dir=None, chunk_size=200_000, workers=None, max_inflight=None):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / "_manifest.json"
+    manifest = {"input": str(Path(input_path).resolve()), "chunk_size": chunk_size}
+    if manifest_path.exists() and json.loads(manifest_path.read_text()) != manifest:
+        raise ValueError(f"{out_dir} holds output for a different input or chunk size; use a new directory")
+    manifest_path.write_text(json.dumps(manifest))
+
+    workers = workers or os.cpu_count() or 1
+    max_inflight = max_inflight or 2 * workers
+    REGISTRY.get(model_dir).preload()
+    t0 = time.perf_counter()
+    done = skipped = rows = 0
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_dir,)) as pool:
+        for i, chunk in enumerate(iter_chunks(input_path, chunk_size)):
+            if (out_dir / f"part-{i:06d}.parquet").exists():
+                skipped += 1
+                continue
+            # Bound memory: at most max_inflight chunks are queued or being scored.
+            while len(pending) >= max_inflight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    rows += f.result()[1]
+                    done += 1
+            pending.add(pool.submit(_score_chunk, i, chunk, str(out_dir)))
+        for f in pending:
+            rows += f.result()[1]
+            done += 1
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "chunks_scored": done,
+        "chunks_skipped": skipped,
+        "rows_scored": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Score a large candidate file against the four models.")
+    p.add_argument("input", help="CSV or Parquet file (or Parquet directory) with the FEATURES columns")
+    p.add_argument("out_dir")
+    p.add_argument("--model-dir", default=None)
+    p.add_argument("--chunk-size", type=int, default=200_000)
+    p.add_argument("--workers", type=int, default=None)
+    args = p.parse_args(argv)
+    report = batch_score(args.input, args.out_dir, args.model_dir, args.chunk_size, args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Surrogate optimizer vs. random search, judged on the data_gen ground truth.
+
+    python benchmarks/bench_optimizer.py --model-dir models --budget 2000 --ratio 10
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agents import UTILITY_WEIGHTS, FormulationIntelligenceAgent  # noqa: E402
+from data_gen import expected_outcomes  # noqa: E402
+
+
+def true_utility(top: pd.DataFrame) -> np.ndarray:
+    # agents.utility applied to the noise-free outcomes instead of the predictions.
+    t = expected_outcomes(top)
+    truth = t[["permeability_score", "irritation_risk", "stability_days", "qc_fail_prob"]].to_numpy()
+    return truth @ UTILITY_WEIGHTS
+
+
+def run(agent, strategy, budget, n, seed, constraints):
+    top = agent.propose_next_experiments(
+        n=n, seed=seed, constraints=constraints, n_candidates=budget, strategy=strategy
+    )
+    info = agent.last_search
+    return {
+        "strategy": strategy,
+        "seed": seed,
+        "scored": info["candidates"],
+        "seconds": info["seconds"],
+        "found": len(top),
+        "model_utility": top["utility"].mean() if len(top) else np.nan,
+        "true_utility": true_utility(top).mean() if len(top) else np.nan,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--model-dir", default=None)
+    p.add_argument("--budget", type=int, default=2000, help="candidates scored by the surrogate optimizer")
+    p.add_argument("--ratio", type=int, default=10, help="random search gets budget * ratio candidates")
+    p.add_argument("--n", type=int, default=12)
+    p.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    p.add_argument("--constrained", action="store_true", help="use the app's default constraints")
+    args = p.parse_args(argv)
+
+    agent = FormulationIntelligenceAgent(args.model_dir)
+    constraints = None
+    if args.constrained:
+        constraints = {"max_irritation": 0.65, "min_stability": 120, "max_fail_prob": 0.40}
+
+    rows = []
+    for seed in args.seeds:
+        rows.append(run(agent, "random", args.budget * args.ratio, args.n, seed, constraints))
+        rows.append(run(agent, "surrogate", args.budget, args.n, seed, constraints))
+    res = pd.DataFrame(rows)
+    print(res.to_string(index=False))
+    print()
+    print(res.groupby("strategy")[["scored", "seconds", "model_utility", "true_utility"]].mean().to_string())
+
+
+if __name__ == "__main__":
+    main()
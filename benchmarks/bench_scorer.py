@@ -0,0 +1,90 @@
+"""ForestScorer vs. the scikit-learn predict path, on one thread and on all cores.
+
+    python benchmarks/bench_scorer.py --model-dir models --rows 100000 --repeat 3
+
+The baseline is what the agents did before ForestScorer: predict (predict_proba for
+the QC fail classifier) on each of the four joblib forests, with the forests' n_jobs set
+to the thread count. Both paths score the same float32 rows. ForestScorer's output is
+checked to be identical to single-threaded predict before any timing is reported
+(multi-threaded predict sums the trees in completion order, so its last bits vary).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agents import sample_candidates  # noqa: E402
+from data_gen import generate_synthetic_formulation_data  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+from scoring import CLIP, TARGETS, ForestScorer  # noqa: E402
+from train_models import train_all  # noqa: E402
+
+
+def predict_baseline(models, X32, n_jobs) -> np.ndarray:
+    out = np.empty((len(X32), len(TARGETS)))
+    for j, key in enumerate(TARGETS):
+        forest = models[key]
+        forest.n_jobs = n_jobs
+        out[:, j] = forest.predict_proba(X32)[:, 1] if key == "fail" else forest.predict(X32)
+        if key in CLIP:
+            np.clip(out[:, j], *CLIP[key], out=out[:, j])
+    return out
+
+
+def best_of(repeat, call) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--model-dir", default=None,
+                   help="joblib models (default: train on 1200 rows into a temp dir)")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args(argv)
+
+    X32 = np.ascontiguousarray(sample_candidates(np.random.default_rng(7), args.rows), dtype=np.float32)
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = Path(workdir) / "models"
+            model_dir.mkdir()
+            base = Path(workdir) / "base.csv"
+            generate_synthetic_formulation_data(1200, seed=7).to_csv(base, index=False)
+            train_all(base, model_dir)
+        models = ModelRegistry(prefer="joblib").get(model_dir).preload()
+        reference = predict_baseline(models, X32, 1)
+
+        for threads in args.threads:
+            scorer = ForestScorer(models, n_jobs=threads)
+            if not np.array_equal(scorer.score_array(X32), reference):
+                raise SystemExit("ForestScorer and predict disagree")
+            for path, call in [("predict", lambda: predict_baseline(models, X32, threads)),
+                               ("ForestScorer", lambda: scorer.score_array(X32))]:
+                seconds = best_of(args.repeat, call)
+                rows.append({"path": path, "threads": threads, "rows": args.rows, "seconds": seconds,
+                             "seconds_per_100k": seconds * 100_000 / args.rows})
+
+    res = pd.DataFrame(rows)
+    base = res[res["path"] == "predict"].set_index("threads")["seconds"]
+    res["speedup_vs_predict"] = res["threads"].map(base) / res["seconds"]
+    print(res.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Check that a time-budgeted proposal search stops close to its budget.
+
+    python benchmarks/check_time_budget.py --budgets 0.25 1 2 --chunk-size 65536 --tolerance 0.25
+
+Runs propose_next_experiments(n_candidates=None, time_budget=b) for every budget and
+strategy, timing the whole call, and exits non-zero when any call takes longer than
+b * (1 + tolerance).
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agents import FormulationIntelligenceAgent  # noqa: E402
+from data_gen import generate_synthetic_formulation_data  # noqa: E402
+from train_models import train_all  # noqa: E402
+
+CONSTRAINTS = {"max_irritation": 0.65, "min_stability": 120, "max_fail_prob": 0.40}
+
+
+def check(agent, budget, chunk_size, strategy, constraints):
+    t0 = time.perf_counter()
+    agent.propose_next_experiments(n=12, n_candidates=None, time_budget=budget, chunk_size=chunk_size,
+                                   strategy=strategy, constraints=constraints)
+    return {
+        "budget": budget,
+        "strategy": strategy + (" constrained" if constraints else ""),
+        "seconds": time.perf_counter() - t0,
+        "candidates": agent.last_search["candidates"],
+        "chunks": agent.last_search["chunks"],
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--model-dir", default=None,
+                   help="models to score with (default: train on 1200 rows into a temp dir)")
+    p.add_argument("--budgets", type=float, nargs="+", default=[0.25, 1.0, 2.0])
+    p.add_argument("--chunk-size", type=int, default=65536)
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed overrun as a fraction of the budget")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = Path(workdir) / "models"
+            model_dir.mkdir()
+            base = Path(workdir) / "base.csv"
+            generate_synthetic_formulation_data(1200, seed=7).to_csv(base, index=False)
+            train_all(base, model_dir)
+        agent = FormulationIntelligenceAgent(model_dir)
+        # Loads the forests, so the first budgeted call does not pay for it.
+        agent.propose_next_experiments(n_candidates=1)
+
+        failed = 0
+        for budget in args.budgets:
+            for strategy, constraints in [("random", None), ("random", CONSTRAINTS), ("pareto", None)]:
+                r = check(agent, budget, args.chunk_size, strategy, constraints)
+                over = r["seconds"] > budget * (1 + args.tolerance)
+                failed += over
+                print(f"{r['strategy']:>18} budget {budget:6.2f}s  took {r['seconds']:7.3f}s  "
+                      f"{r['candidates']:>12,d} rows in {r['chunks']:>4d} chunks{'  OVER' if over else ''}",
+                      flush=True)
+
+    if failed:
+        print(f"FAILED: {failed} search(es) ran more than {args.tolerance:.0%} past their budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Benchmark every pipeline stage over several data sizes.
+
+    python benchmarks/suite.py --scales 1000 10000 --threshold 0.2 --memory-threshold 0.2
+    python benchmarks/suite.py --scales 1000 10000 --out benchmarks/baseline.json --baseline none
+
+Each (stage, scale) is timed as the best of --repeat runs and then run once more under
+tracemalloc for peak Python/NumPy memory. Results are written as JSON (scratch runs go to
+the git-ignored benchmarks/results/). The run is compared against the committed
+benchmarks/baseline.json (or --baseline) and exits non-zero when any stage is slower than
+baseline * (1 + threshold), or its peak memory exceeds baseline * (1 + memory-threshold) by
+more than MEMORY_FLOOR_MIB. Regenerate the baseline on the reference machine when a change
+is meant to move the numbers.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from agents import EvidenceReadinessAgent, FormulationIntelligenceAgent  # noqa: E402
+from authoring import render_evidence_pack_md, render_formulation_recs_md  # noqa: E402
+from data_gen import generate_synthetic_dev_notes, generate_synthetic_formulation_data  # noqa: E402
+from orchestrator import orchestrate  # noqa: E402
+from sensitivity import SensitivitySweeper  # noqa: E402
+from train_models import train_all  # noqa: E402
+
+CONSTRAINTS = {"max_irritation": 0.65, "min_stability": 120, "max_fail_prob": 0.40}
+BASELINE = ROOT / "benchmarks" / "baseline.json"
+# Peak memory growth below this is not flagged, whatever the ratio: small stages peak at a
+# fraction of a MiB and vary with allocator state.
+MEMORY_FLOOR_MIB = 1.0
+
+
+class Context:
+    """Lazily built inputs shared by the stages of one scale."""
+
+    def __init__(self, scale, model_dir, workdir):
+        self.scale = scale
+        self.model_dir = model_dir
+        self.workdir = Path(workdir)
+        self._cache = {}
+
+    def get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def formulations(self):
+        return self.get("formulations", lambda: generate_synthetic_formulation_data(self.scale, seed=7))
+
+    @property
+    def notes(self):
+        return self.get("notes", lambda: generate_synthetic_dev_notes(
+            self.formulations, n_notes=max(1, self.scale // 6), seed=11))
+
+    @property
+    def csv(self):
+        def build():
+            path = self.workdir / f"formulations_{self.scale}.csv"
+            self.formulations.to_csv(path, index=False)
+            return path
+        return self.get("csv", build)
+
+    @property
+    def agent(self):
+        return FormulationIntelligenceAgent(self.model_dir)
+
+    @property
+    def proposals(self):
+        def build():
+            df = self.agent.score(self.formulations.drop(columns="exp_id"))
+            df["proposal_id"] = [f"PROP-{i:03d}" for i in range(1, len(df)+1)]
+            return df
+        return self.get("proposals", build)
+
+    @property
+    def pack(self):
+        return self.get("pack", lambda: EvidenceReadinessAgent().build_evidence_pack(
+            self.formulations, self.notes, top_n=self.scale))
+
+
+def _train(ctx):
+    out = ctx.workdir / f"models_{ctx.scale}"
+    out.mkdir(exist_ok=True)
+    train_all(ctx.csv, out)
+
+
+# stage -> (setup run untimed before measuring, measured call)
+STAGES = {
+    "train_all": (lambda ctx: ctx.csv, _train),
+    "score": (lambda ctx: (ctx.formulations, ctx.agent), lambda ctx: ctx.agent.score(ctx.formulations)),
+    "propose": (lambda ctx: ctx.agent, lambda ctx: ctx.agent.propose_next_experiments(
+        n=12, n_candidates=ctx.scale)),
+    "propose_constrained": (lambda ctx: ctx.agent, lambda ctx: ctx.agent.propose_next_experiments(
+        n=12, n_candidates=ctx.scale, constraints=CONSTRAINTS)),
+    "propose_pareto": (lambda ctx: ctx.agent, lambda ctx: ctx.agent.propose_next_experiments(
+        n_candidates=ctx.scale, strategy="pareto")),
+    # 12 bases on a 2-D grid, about ctx.scale rows in total; a fresh sweeper so nothing is cached.
+    "sensitivity_sweep": (lambda ctx: ctx.agent, lambda ctx: SensitivitySweeper().sweep(
+        ctx.agent, ctx.formulations.head(12), ["ph", "surfactant_pct"],
+        resolution=max(2, round((ctx.scale / 12) ** 0.5)))),
+    "orchestrate": (lambda ctx: ctx.proposals, lambda ctx: orchestrate(ctx.proposals, "balanced")),
+    "build_evidence_pack": (lambda ctx: ctx.notes, lambda ctx: EvidenceReadinessAgent().build_evidence_pack(
+        ctx.formulations, ctx.notes, top_n=12)),
+    "render_evidence_pack_md": (lambda ctx: ctx.pack, lambda ctx: render_evidence_pack_md(ctx.pack)),
+    "render_formulation_recs_md": (lambda ctx: ctx.proposals, lambda ctx: render_formulation_recs_md(
+        ctx.proposals, top_k=ctx.scale)),
+}
+
+
+def measure(stage, ctx, repeat):
+    setup, call = STAGES[stage]
+    setup(ctx)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        call(ctx)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    call(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return {
+        "stage": stage,
+        "scale": ctx.scale,
+        "seconds": best,
+        "rows_per_second": ctx.scale / best if best else None,
+        "peak_mib": peak / 2**20,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold, memory_threshold) -> pd.DataFrame:
+    key = ["stage", "scale"]
+    cur = pd.DataFrame(results)[key + ["seconds", "peak_mib"]]
+    base = pd.DataFrame(baseline["results"])[key + ["seconds", "peak_mib"]]
+    merged = cur.merge(base, on=key, suffixes=("", "_baseline"))
+    merged["ratio"] = merged["seconds"] / merged["seconds_baseline"]
+    merged["mem_ratio"] = merged["peak_mib"] / merged["peak_mib_baseline"]
+    merged["slower"] = merged["ratio"] > 1 + threshold
+    merged["bigger"] = ((merged["peak_mib"] > merged["peak_mib_baseline"] * (1 + memory_threshold))
+                        & (merged["peak_mib"] - merged["peak_mib_baseline"] > MEMORY_FLOOR_MIB))
+    merged["regression"] = merged["slower"] | merged["bigger"]
+    return merged
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    p.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    p.add_argument("--max-train-scale", type=int, default=1_000_000,
+                   help="skip train_all above this many rows")
+    p.add_argument("--model-dir", default=None,
+                   help="models for the scoring stages (default: train on 1200 rows into a temp dir)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--out", default=str(ROOT / "benchmarks" / "results" / "latest.json"))
+    p.add_argument("--baseline", default=str(BASELINE),
+                   help="results file to compare against; 'none' skips the comparison")
+    p.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown vs baseline")
+    p.add_argument("--memory-threshold", type=float, default=0.2,
+                   help="allowed peak memory growth vs baseline")
+    args = p.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = Path(workdir) / "models"
+            model_dir.mkdir()
+            base = Path(workdir) / "base.csv"
+            generate_synthetic_formulation_data(1200, seed=7).to_csv(base, index=False)
+            train_all(base, model_dir)
+
+        for scale in args.scales:
+            ctx = Context(scale, model_dir, workdir)
+            for stage in args.stages:
+                if stage == "train_all" and scale > args.max_train_scale:
+                    continue
+                r = measure(stage, ctx, args.repeat)
+                results.append(r)
+                print(f"{stage:>28} {scale:>10,d}  {r['seconds']:9.4f}s  "
+                      f"{r['rows_per_second'] or 0:14,.0f} rows/s  {r['peak_mib']:9.1f} MiB", flush=True)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"environment": environment(), "results": results}, indent=2))
+    print(f"results written to {out}")
+
+    if args.baseline != "none" and Path(args.baseline).resolve() != out.resolve():
+        cmp = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold,
+                      args.memory_threshold)
+        print(cmp.to_string(index=False))
+        if cmp["regression"].any():
+            print(f"REGRESSION: {int(cmp['slower'].sum())} stage(s) slower than baseline by "
+                  f">{args.threshold:.0%}, {int(cmp['bigger'].sum())} with peak memory above "
+                  f"baseline by >{args.memory_threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
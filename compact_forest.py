@@ -0,0 +1,293 @@
+"""Compact, memory-mappable forest artifacts.
+
+    python compact_forest.py --model-dir models                  # lossless
+    python compact_forest.py --model-dir models --tolerance 0.01 --float32-values
+
+Each ``model_<target>.joblib`` is converted into a ``model_<target>.forest/`` directory of
+flat ``.npy`` arrays (one entry per node, all trees concatenated) plus ``meta.json``:
+
+    feature    int8     split feature, -1 for leaves
+    threshold  float32  split threshold, rounded down to the nearest float32
+    right      int32    right child (tree-local id); the left child of node i is i + 1
+    value      float64  prediction at the node (class-1 probability for the classifier)
+    roots      int64    offset of each tree's first node
+
+scikit-learn compares float32 inputs against float64 thresholds, so a threshold rounded down
+to float32 makes exactly the same decisions: with default settings the compact forest is
+bit-identical to the original. ``max_depth`` (or the smallest depth within ``tolerance``)
+collapses deeper subtrees into leaves holding their node value, and ``float32_values``
+halves the value array; both change predictions, as shown in the accuracy report.
+
+Arrays are opened with ``mmap_mode="r"``. A target's trees are rebuilt as scikit-learn
+``Tree`` objects (whose C ``apply`` is the fast path) only when the target is first scored.
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.tree._tree import NODE_DTYPE, Tree
+
+from scoring import CLIP, _leaf_values
+
+SUFFIX = ".forest"
+ARRAYS = ("feature", "threshold", "right", "missing_left", "value", "roots", "depths")
+_LEAF = -1
+_UNDEFINED = -2  # scikit-learn's feature/threshold marker for leaves
+
+
+def compact_path(joblib_path) -> Path:
+    joblib_path = Path(joblib_path)
+    return joblib_path.with_name(joblib_path.stem + SUFFIX)
+
+
+def _node_depths(left, right):
+    depth = np.zeros(len(left), dtype=np.int32)
+    frontier = np.array([0])
+    while len(frontier):
+        frontier = frontier[left[frontier] != _LEAF]
+        children = np.concatenate([left[frontier], right[frontier]])
+        depth[children] = depth[np.concatenate([frontier, frontier])] + 1
+        frontier = children
+    return depth
+
+
+def _compact_tree(estimator, classifier, max_depth=None):
+    t = estimator.tree_
+    left, right = t.children_left, t.children_right
+    internal = np.flatnonzero(left != _LEAF)
+    if not (left[internal] == internal + 1).all():
+        # Only the depth-first builder numbers nodes this way; best-first trees
+        # (max_leaf_nodes) would be exported with the wrong structure.
+        raise ValueError("compact format needs depth-first node order (left child of node i = i + 1); "
+                         "trees grown with max_leaf_nodes are not supported")
+    value = _leaf_values(estimator, classifier)
+    depth = _node_depths(left, right)
+    keep = np.ones(t.node_count, dtype=bool) if max_depth is None else depth <= max_depth
+    leaf = (left == _LEAF) | (depth == max_depth if max_depth is not None else False)
+    # Dropping whole subtrees keeps the remaining nodes in depth-first order, so left = i + 1 still holds.
+    new_id = np.cumsum(keep) - 1
+    threshold = t.threshold.astype(np.float32)
+    up = threshold.astype(np.float64) > t.threshold
+    threshold[up] = np.nextafter(threshold[up], np.float32(-np.inf))
+    return {
+        "feature": np.where(leaf, _LEAF, t.feature)[keep].astype(np.int8),
+        "threshold": np.where(leaf, np.float32(np.nan), threshold)[keep],
+        "right": np.where(leaf, _LEAF, new_id[right])[keep].astype(np.int32),
+        "missing_left": t.missing_go_to_left[keep] if hasattr(t, "missing_go_to_left")
+        else np.zeros(int(keep.sum()), dtype=np.uint8),
+        "value": value[keep],
+        "depth": int(depth[keep & leaf].max()),
+    }
+
+
+def export_forest(forest, path, classifier, max_depth=None, float32_values=False, source=None) -> int:
+    # Writes the directory next to its final location and swaps it in, so a reader never
+    # sees a partial artifact. Returns the bytes written.
+    trees = [_compact_tree(e, classifier, max_depth) for e in forest.estimators_]
+    arrays = {
+        name: np.concatenate([tr[name] for tr in trees])
+        for name in ("feature", "threshold", "right", "missing_left", "value")
+    }
+    if float32_values:
+        arrays["value"] = arrays["value"].astype(np.float32)
+    sizes = np.array([len(tr["feature"]) for tr in trees])
+    arrays["roots"] = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    arrays["depths"] = np.array([tr["depth"] for tr in trees], dtype=np.int32)
+
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+    meta = {
+        "n_trees": len(trees),
+        "n_nodes": int(sizes.sum()),
+        "n_features": int(forest.n_features_in_),
+        "classifier": classifier,
+        "max_depth": max_depth,
+        "float32_values": float32_values,
+        "source": source,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return artifact_nbytes(path)
+
+
+def artifact_nbytes(path) -> int:
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.iterdir())
+    return path.stat().st_size
+
+
+class CompactForest:
+    """A forest read from a ``.forest`` directory.
+
+    ``tree_pairs()`` is what ``scoring.ForestScorer`` consumes; ``predict`` and
+    ``predict_proba`` mirror the scikit-learn methods the agents used to call.
+    """
+
+    def __init__(self, path, mmap_mode="r"):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.arrays = {name: np.load(self.path / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAYS}
+        self.n_features_in_ = self.meta["n_features"]
+        self.classifier = self.meta["classifier"]
+        self._pairs = None
+
+    @property
+    def n_trees(self) -> int:
+        return self.meta["n_trees"]
+
+    def _build_tree(self, start, stop, depth):
+        a = self.arrays
+        feature = a["feature"][start:stop]
+        leaf = feature == _LEAF
+        n = stop - start
+        nodes = np.zeros(n, dtype=NODE_DTYPE)
+        nodes["left_child"] = np.where(leaf, _LEAF, np.arange(1, n + 1))
+        nodes["right_child"] = a["right"][start:stop]
+        nodes["feature"] = np.where(leaf, _UNDEFINED, feature)
+        nodes["threshold"] = np.where(leaf, _UNDEFINED, a["threshold"][start:stop])
+        if "missing_go_to_left" in NODE_DTYPE.names:
+            nodes["missing_go_to_left"] = a["missing_left"][start:stop]
+        values = np.zeros((n, 1, 1), dtype=np.float64)
+        tree = Tree(self.n_features_in_, np.array([1], dtype=np.intp), 1)
+        tree.__setstate__({"max_depth": int(depth), "node_count": n, "nodes": nodes, "values": values})
+        return tree
+
+    def tree_pairs(self) -> list:
+        # (Tree, leaf values) per estimator; the Trees carry structure only, values stay mapped.
+        if self._pairs is None:
+            roots = self.arrays["roots"]
+            stops = np.append(roots[1:], self.meta["n_nodes"])
+            value = self.arrays["value"]
+            self._pairs = [
+                (self._build_tree(int(s), int(e), d), value[s:e])
+                for s, e, d in zip(roots, stops, self.arrays["depths"])
+            ]
+        return self._pairs
+
+    def _mean(self, X):
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        acc = np.zeros(len(X32))
+        for tree, values in self.tree_pairs():
+            acc += values[tree.apply(X32)]
+        return acc / self.n_trees
+
+    def predict(self, X) -> np.ndarray:
+        if self.classifier:
+            return (self._mean(X) > 0.5).astype(np.int64)
+        return self._mean(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self._mean(X)
+        return np.column_stack([1.0 - p, p])
+
+
+def _forest_predictions(pairs, X32, key):
+    acc = np.zeros(len(X32))
+    for tree, values in pairs:
+        acc += values[tree.apply(X32)]
+    acc /= len(pairs)
+    if key in CLIP:
+        np.clip(acc, *CLIP[key], out=acc)
+    return acc
+
+
+def compact_models(model_dir=None, max_depth=None, tolerance=None, float32_values=False,
+                   X=None, truth=None, min_depth=4):
+    """Convert the four joblib artifacts in ``model_dir`` and return an accuracy report.
+
+    With ``tolerance`` the depth of each target is the smallest one whose mean absolute
+    change against the original predictions on ``X`` is at most ``tolerance`` times the
+    standard deviation of those predictions. ``truth`` (target -> labels for ``X``) adds
+    the error of both versions against the labels.
+    """
+    import joblib
+    import pandas as pd
+    from agents import sample_candidates
+    from model_registry import MODEL_FILES, default_model_dir
+
+    model_dir = Path(model_dir) if model_dir is not None else default_model_dir()
+    if X is None:
+        X = sample_candidates(np.random.default_rng(0), 20_000)
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+
+    rows = []
+    for key, fname in MODEL_FILES.items():
+        src = model_dir / fname
+        forest = joblib.load(src)
+        classifier = key == "fail"
+        original = _forest_predictions(
+            [(e.tree_, _leaf_values(e, classifier)) for e in forest.estimators_], X32, key)
+        full_depth = max(e.tree_.max_depth for e in forest.estimators_)
+        scale = original.std() or 1.0
+        st = src.stat()
+        source = {"file": fname, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+        depths = [max_depth]
+        if tolerance is not None:
+            depths = list(range(min_depth, full_depth)) + [None]
+        dst = compact_path(src)
+        for depth in depths:
+            nbytes = export_forest(forest, dst, classifier, depth, float32_values, source)
+            compact = CompactForest(dst)
+            pred = _forest_predictions(compact.tree_pairs(), X32, key)
+            diff = np.abs(pred - original)
+            if tolerance is None or diff.mean() <= tolerance * scale:
+                break
+
+        row = {
+            "target": key,
+            "max_depth": depth if depth is not None else full_depth,
+            "nodes_before": int(sum(e.tree_.node_count for e in forest.estimators_)),
+            "nodes_after": compact.meta["n_nodes"],
+            "joblib_bytes": st.st_size,
+            "compact_bytes": nbytes,
+            "mean_abs_change": float(diff.mean()),
+            "max_abs_change": float(diff.max()),
+            "identical": bool(np.array_equal(pred, original)),
+        }
+        if truth is not None and key in truth:
+            y = np.asarray(truth[key], dtype=np.float64)
+            row["error_before"] = float(np.abs(original - y).mean())
+            row["error_after"] = float(np.abs(pred - y).mean())
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Convert the joblib forests into compact, memory-mappable artifacts.")
+    p.add_argument("--model-dir", default=None)
+    p.add_argument("--max-depth", type=int, default=None, help="collapse subtrees below this depth")
+    p.add_argument("--tolerance", type=float, default=None,
+                   help="pick the smallest depth whose mean change is within this fraction of the prediction std")
+    p.add_argument("--float32-values", action="store_true", help="store node values as float32")
+    p.add_argument("--data", default=None,
+                   help="CSV with FEATURES (and targets) to measure accuracy on; default: 20k random candidates")
+    args = p.parse_args(argv)
+
+    X = truth = None
+    if args.data:
+        import pandas as pd
+        from train_models import FEATURES, TARGET_SPECS
+        df = pd.read_csv(args.data)
+        X = df[FEATURES].to_numpy(dtype=np.float32)
+        truth = {key: df[col] for key, (col, *_rest) in zip(("perm", "irr", "stab", "fail"), TARGET_SPECS)
+                 if col in df}
+    t0 = time.perf_counter()
+    report = compact_models(args.model_dir, args.max_depth, args.tolerance, args.float32_values, X, truth)
+    print(report.to_string(index=False))
+    print(f"total: {report['joblib_bytes'].sum() / 2**20:.1f} MiB -> {report['compact_bytes'].sum() / 2**20:.1f} MiB "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,7 @@ import pandas as pd
 def sigmoid(x):
     return 1 / (1 + np.exp(-x))
 
-def generate_synthetic_formulation_data(n=1200, seed=7):
-    rng = np.random.default_rng(seed)
-
-    api_load = rng.uniform(0.1, 5.0, n)
-    solvent_ratio = rng.uniform(0.0, 1.0, n)
-    polymer_pct = rng.uniform(0.0, 8.0, n)
-    surfactant_pct = rng.uniform(0.0, 3.0, n)
-    ph = rng.uniform(4.0, 8.0, n)
-    viscosity = rng.lognormal(mean=2.7, sigma=0.4, size=n)
-    process_temp = rng.uniform(18, 45, n)
-    mix_time = rng.uniform(2, 45, n)
-
+def _latents(api_load, solvent_ratio, polymer_pct, surfactant_pct, ph, viscosity, process_temp):
     perm_latent = (
         1.2 * solvent_ratio +
         0.7 * (surfactant_pct / 3.0) -
@@ -23,16 +12,12 @@ def generate_synthetic_formulation_data(n=1200, seed=7):
         0.2 * (api_load / 5.0) -
         0.15 * np.abs(ph - 6.0)
     )
-    permeability_score = 100 * sigmoid(perm_latent + rng.normal(0, 0.15, n))
-
     irr_latent = (
         1.0 * (surfactant_pct / 3.0) +
         0.5 * (api_load / 5.0) +
         0.35 * np.abs(ph - 6.0) +
         0.1 * (process_temp - 25) / 20
     )
-    irritation_risk = np.clip(sigmoid(irr_latent + rng.normal(0, 0.2, n)), 0, 1)
-
     stab_latent = (
         1.4
         - 0.7 * solvent_ratio
@@ -41,13 +26,49 @@ def generate_synthetic_formulation_data(n=1200, seed=7):
         - 0.15 * (api_load / 5.0)
         + 0.10 * (polymer_pct / 8.0)
     )
-    stability_days = np.clip(365 * sigmoid(stab_latent + rng.normal(0, 0.18, n)), 15, 365)
+    return perm_latent, irr_latent, stab_latent
+
+def _qc_fail_prob(irritation_risk, stability_days):
+    return np.clip(0.15 * irritation_risk + 0.25 * (1 - stability_days / 365), 0, 0.9)
+
+def expected_outcomes(df):
+    """Noise-free ground truth for a frame of formulation features."""
+    perm_latent, irr_latent, stab_latent = _latents(
+        *(np.asarray(df[c], dtype=float) for c in
+          ["api_load", "solvent_ratio", "polymer_pct", "surfactant_pct", "ph", "viscosity", "process_temp"])
+    )
+    irritation_risk = np.clip(sigmoid(irr_latent), 0, 1)
+    stability_days = np.clip(365 * sigmoid(stab_latent), 15, 365)
+    return pd.DataFrame({
+        "permeability_score": 100 * sigmoid(perm_latent),
+        "irritation_risk": irritation_risk,
+        "stability_days": stability_days,
+        "qc_fail_prob": _qc_fail_prob(irritation_risk, stability_days),
+    }, index=df.index)
+
+def generate_synthetic_formulation_data(n=1200, seed=7, id_offset=0):
+    rng = np.random.default_rng(seed)
 
-    qc_fail_prob = np.clip(0.15 * irritation_risk + 0.25 * (1 - stability_days / 365), 0, 0.9)
+    api_load = rng.uniform(0.1, 5.0, n)
+    solvent_ratio = rng.uniform(0.0, 1.0, n)
+    polymer_pct = rng.uniform(0.0, 8.0, n)
+    surfactant_pct = rng.uniform(0.0, 3.0, n)
+    ph = rng.uniform(4.0, 8.0, n)
+    viscosity = rng.lognormal(mean=2.7, sigma=0.4, size=n)
+    process_temp = rng.uniform(18, 45, n)
+    mix_time = rng.uniform(2, 45, n)
+
+    perm_latent, irr_latent, stab_latent = _latents(
+        api_load, solvent_ratio, polymer_pct, surfactant_pct, ph, viscosity, process_temp
+    )
+    permeability_score = 100 * sigmoid(perm_latent + rng.normal(0, 0.15, n))
+    irritation_risk = np.clip(sigmoid(irr_latent + rng.normal(0, 0.2, n)), 0, 1)
+    stability_days = np.clip(365 * sigmoid(stab_latent + rng.normal(0, 0.18, n)), 15, 365)
+    qc_fail_prob = _qc_fail_prob(irritation_risk, stability_days)
     qc_fail = (rng.uniform(0, 1, n) < qc_fail_prob).astype(int)
 
     df = pd.DataFrame({
-        "exp_id": [f"EXP-{i:05d}" for i in range(n)],
+        "exp_id": _prefixed_ids("EXP-", np.arange(id_offset, id_offset + n), 5),
         "api_load": api_load,
         "solvent_ratio": solvent_ratio,
         "polymer_pct": polymer_pct,
@@ -63,26 +84,78 @@ def generate_synthetic_formulation_data(n=1200, seed=7):
     })
     return df
 
+_NOTE_PHRASES = [
+    "Stability concern: accelerated degradation observed.",
+    "Tolerability concern: irritation proxy elevated.",
+    "Permeability signal strong; favorable delivery profile.",
+    "QC observation: out-of-spec event recorded in run.",
+]
+# Observation text for every combination of the four flags above (bit i = phrase i).
+_OBSERVATIONS = np.array(
+    [" ".join(p for i, p in enumerate(_NOTE_PHRASES) if code >> i & 1)
+     or "Development observation: within expected bounds."
+     for code in range(1 << len(_NOTE_PHRASES))],
+    dtype=object,
+)
+
+def _prefixed_ids(prefix, values, width):
+    return prefix + pd.Series(values).astype(str).str.zfill(width)
+
 def generate_synthetic_dev_notes(formulations_df, n_notes=180, seed=11):
     rng = np.random.default_rng(seed)
-    sample = formulations_df.sample(min(len(formulations_df), n_notes), random_state=seed).copy()
-    rows = []
-    for _, r in sample.iterrows():
-        obs = []
-        if r["stability_days"] < 120:
-            obs.append("Stability concern: accelerated degradation observed.")
-        if r["irritation_risk"] > 0.65:
-            obs.append("Tolerability concern: irritation proxy elevated.")
-        if r["permeability_score"] > 70:
-            obs.append("Permeability signal strong; favorable delivery profile.")
-        if r["qc_fail"] == 1:
-            obs.append("QC observation: out-of-spec event recorded in run.")
-        if not obs:
-            obs.append("Development observation: within expected bounds.")
-        rows.append({
-            "note_id": f"NOTE-{rng.integers(100000,999999)}",
-            "exp_id": r["exp_id"],
-            "observation": " ".join(obs),
-            "review_status": rng.choice(["draft","reviewed","approved"], p=[0.35,0.45,0.20]),
-        })
-    return pd.DataFrame(rows)
+    sample = formulations_df.sample(min(len(formulations_df), n_notes), random_state=seed)
+    code = (
+        (sample["stability_days"].to_numpy() < 120).astype(np.intp)
+        | (sample["irritation_risk"].to_numpy() > 0.65) << 1
+        | (sample["permeability_score"].to_numpy() > 70) << 2
+        | (sample["qc_fail"].to_numpy() == 1) << 3
+    )
+    n = len(sample)
+    return pd.DataFrame({
+        "note_id": _prefixed_ids("NOTE-", rng.integers(100000, 999999, n), 6),
+        "exp_id": sample["exp_id"].to_numpy(),
+        "observation": _OBSERVATIONS[code],
+        "review_status": rng.choice(["draft","reviewed","approved"], size=n, p=[0.35,0.45,0.20]),
+    })
+
+def _generate_shard(store_dir, shard, n, id_offset, notes_fraction, seed_seq):
+    from experiment_store import ExperimentStore
+    form_seed, notes_seed = (int(s) for s in seed_seq.generate_state(2))
+    df = generate_synthetic_formulation_data(n, seed=form_seed, id_offset=id_offset)
+    notes = generate_synthetic_dev_notes(df, n_notes=int(round(n * notes_fraction)), seed=notes_seed)
+    store = ExperimentStore(store_dir)
+    store.append("formulations", df, part_name=f"shard-{shard:05d}")
+    store.append("dev_notes", notes, part_name=f"shard-{shard:05d}")
+    return shard, len(df), len(notes)
+
+def generate_sharded(store_dir, n=10_000_000, n_shards=32, master_seed=7, notes_fraction=1/6, processes=None):
+    # Each shard gets an independent stream spawned from master_seed and writes its rows
+    # straight into the experiment store, so memory is bounded by one shard per process.
+    # Output is reproducible for a given (master_seed, n, n_shards).
+    from concurrent.futures import ProcessPoolExecutor
+    sizes = np.full(n_shards, n // n_shards)
+    sizes[: n % n_shards] += 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    seeds = np.random.SeedSequence(master_seed).spawn(n_shards)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(_generate_shard, str(store_dir), i, int(sizes[i]), int(offsets[i]), notes_fraction, seeds[i])
+            for i in range(n_shards)
+        ]
+        return [f.result() for f in futures]
+
+def main(argv=None):
+    import argparse
+    p = argparse.ArgumentParser(description="Write sharded synthetic experiments to an experiment store.")
+    p.add_argument("store_dir")
+    p.add_argument("--n", type=int, default=10_000_000)
+    p.add_argument("--shards", type=int, default=32)
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--notes-fraction", type=float, default=1/6)
+    p.add_argument("--processes", type=int, default=None)
+    args = p.parse_args(argv)
+    done = generate_sharded(args.store_dir, args.n, args.shards, args.seed, args.notes_fraction, args.processes)
+    print(f"wrote {sum(r[1] for r in done)} experiments and {sum(r[2] for r in done)} notes in {len(done)} shards")
+
+if __name__ == "__main__":
+    main()
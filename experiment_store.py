@@ -0,0 +1,135 @@
+import re
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# table -> hive partition columns
+TABLES = {
+    "formulations": [],
+    "dev_notes": ["review_status"],
+}
+# Numeric copy of exp_id ("EXP-00042" -> 42) so range predicates can be pushed down to
+# row-group statistics; string ids stop sorting numerically past five digits.
+EXP_NUM = "_exp_num"
+# exp_id format; the single group is the number stored in EXP_NUM.
+EXP_ID_PATTERN = r"EXP-(\d+)"
+# Row order: part name + row position within the append. Partitioned tables are re-sorted
+# on them after a scan, so rows come back ordered by part name, whichever writer finished
+# first. Stores written before these columns existed carry the older _seq column instead.
+PART, ROW = "_part", "_row"
+SEQ = "_seq"
+HIDDEN = (EXP_NUM, PART, ROW, SEQ)
+
+
+def exp_num(exp_ids: pd.Series, pattern=EXP_ID_PATTERN) -> pd.Series:
+    nums = exp_ids.astype(str).str.fullmatch(pattern)
+    if not nums.all():
+        bad = exp_ids[~nums].head(3).tolist()
+        raise ValueError(f"exp_id values do not match {pattern!r}: {bad}")
+    return exp_ids.astype(str).str.extract(pattern, expand=False).astype("int64")
+
+
+class ExperimentStore:
+    """Append-only, partitioned Parquet tables for formulations and development notes.
+
+    Each append writes new part files and never rewrites existing ones. Reads go through
+    ``pyarrow.dataset``, so column projection, partition pruning (``review_status``) and
+    row-group pruning (``exp_range``) happen before anything is materialized in pandas.
+    """
+
+    def __init__(self, root, row_group_size=131072, exp_id_pattern=EXP_ID_PATTERN):
+        if re.compile(exp_id_pattern).groups != 1:
+            raise ValueError("exp_id_pattern needs exactly one group capturing the experiment number")
+        self.root = Path(root)
+        self.row_group_size = row_group_size
+        self.exp_id_pattern = exp_id_pattern
+
+    def _table_dir(self, table) -> Path:
+        if table not in TABLES:
+            raise KeyError(f"unknown table: {table!r}")
+        return self.root / table
+
+    def exists(self, table=None) -> bool:
+        tables = [table] if table else list(TABLES)
+        return all(any(self._table_dir(t).rglob("*.parquet")) for t in tables)
+
+    def append(self, table, df: pd.DataFrame, part_name=None) -> None:
+        # Rows are read back ordered by part name, then position. Default part names sort by
+        # write time (append order); pass part_name when several writers append concurrently,
+        # e.g. shard numbers, so the read order does not depend on which finished first.
+        table_dir = self._table_dir(table)
+        part_name = part_name or f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        df = df.assign(**{
+            EXP_NUM: exp_num(df["exp_id"], self.exp_id_pattern),
+            PART: part_name,
+            ROW: pd.RangeIndex(len(df), dtype="int64"),
+        })
+        data = pa.Table.from_pandas(df, preserve_index=False)
+        partition_cols = TABLES[table]
+        if partition_cols:
+            ds.write_dataset(
+                data,
+                table_dir,
+                format="parquet",
+                partitioning=partition_cols,
+                partitioning_flavor="hive",
+                basename_template=f"part-{part_name}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=self.row_group_size,
+                min_rows_per_group=min(self.row_group_size, len(df)) or 1,
+            )
+        else:
+            table_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(data, table_dir / f"part-{part_name}.parquet", row_group_size=self.row_group_size)
+
+    def dataset(self, table) -> ds.Dataset:
+        return ds.dataset(self._table_dir(table), format="parquet", partitioning="hive")
+
+    def _filter(self, review_status=None, exp_range=None, filter=None):
+        expr = filter
+        if review_status is not None:
+            statuses = [review_status] if isinstance(review_status, str) else list(review_status)
+            e = ds.field("review_status").isin(statuses)
+            expr = e if expr is None else expr & e
+        if exp_range is not None:
+            lo, hi = exp_range
+            e = (ds.field(EXP_NUM) >= lo) & (ds.field(EXP_NUM) < hi)
+            expr = e if expr is None else expr & e
+        return expr
+
+    def _columns(self, table, columns):
+        if columns is not None:
+            return list(columns)
+        return [c for c in self.dataset(table).schema.names if c not in HIDDEN]
+
+    def scan(self, table, columns=None, review_status=None, exp_range=None, filter=None, batch_size=131072):
+        """Yield pyarrow RecordBatches; exp_range is a half-open [lo, hi) range of exp numbers."""
+        dataset = self.dataset(table)
+        return dataset.to_batches(
+            columns=self._columns(table, columns),
+            filter=self._filter(review_status, exp_range, filter),
+            batch_size=batch_size,
+        )
+
+    def read(self, table, columns=None, review_status=None, exp_range=None, filter=None) -> pd.DataFrame:
+        dataset = self.dataset(table)
+        cols = self._columns(table, columns)
+        names = dataset.schema.names
+        order = [PART, ROW] if PART in names else [SEQ] if SEQ in names else []
+        extra = [c for c in order if c not in cols] if TABLES[table] else []
+        data = dataset.to_table(columns=cols + extra, filter=self._filter(review_status, exp_range, filter))
+        if extra:
+            data = data.sort_by([(c, "ascending") for c in order]).drop_columns(extra)
+        df = data.to_pandas()
+        if "review_status" in df:
+            df["review_status"] = df["review_status"].astype(str)
+        return df
+
+    def count(self, table, review_status=None, exp_range=None, filter=None) -> int:
+        return self.dataset(table).count_rows(filter=self._filter(review_status, exp_range, filter))
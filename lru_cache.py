@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+
+def nbytes(entry) -> int:
+    # An array, or a tuple of arrays.
+    if isinstance(entry, tuple):
+        return sum(a.nbytes for a in entry)
+    return entry.nbytes
+
+
+class BoundedLRU:
+    """Thread-safe LRU of array entries, bounded by entry count and total bytes.
+
+    Keys start with (model dir, model version). ``retire`` drops the entries of a model
+    directory built by any other version, so callers pass the version the registry hands
+    out and stale results are never served. An entry larger than ``max_bytes`` is not kept.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def retire(self, model_dir, version) -> None:
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == model_dir and k[1] != version]:
+                self._drop(stale)
+
+    def get(self, key):
+        # The entry, or None; counts a hit or a miss.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry) -> None:
+        size = nbytes(entry)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self.nbytes -= nbytes(self._entries.pop(key))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+
+from compact_forest import CompactForest, compact_path
+from scoring import ForestScorer
+from tracing import span
+
+
+MODEL_FILES = {
+    "perm": "model_perm.joblib",
+    "irr": "model_irr.joblib",
+    "stab": "model_stab.joblib",
+    "fail": "model_fail.joblib",
+}
+
+
+def default_model_dir() -> Path:
+    return Path(__file__).resolve().parent / "models"
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelSet:
+    """The four forests of one model directory, plus the file signature they came from.
+
+    Each forest is loaded on first access, so a caller that scores one target only pays
+    for that one.
+    """
+
+    def __init__(self, model_dir: Path, fmt: str, signature: tuple, version: int, registry=None):
+        self.model_dir = model_dir
+        self.format = fmt
+        self.signature = signature
+        self.version = version
+        self.models = {}
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._scorer = None
+
+    def _load(self, key):
+        path = self.model_dir / MODEL_FILES[key]
+        mmap_mode = self._registry.mmap_mode if self._registry is not None else "r"
+        if self.format == "compact":
+            return CompactForest(compact_path(path), mmap_mode=mmap_mode)
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    def __getitem__(self, key):
+        model = self.models.get(key)
+        if model is None:
+            with self._lock:
+                if key not in self.models:
+                    t0 = time.perf_counter()
+                    with span("model_load", model_dir=str(self.model_dir), target=key, format=self.format):
+                        self.models[key] = self._load(key)
+                    if self._registry is not None:
+                        self._registry._loaded(time.perf_counter() - t0)
+                model = self.models[key]
+        return model
+
+    def preload(self) -> "ModelSet":
+        # Loads every target and prepares its trees for scoring, e.g. before forking workers.
+        for key in MODEL_FILES:
+            self.scorer.trees[key]
+        return self
+
+    @property
+    def loaded(self) -> list:
+        return [key for key in MODEL_FILES if key in self.models]
+
+    @property
+    def scorer(self) -> ForestScorer:
+        if self._scorer is None:
+            self._scorer = ForestScorer(self)
+        return self._scorer
+
+
+class ModelRegistry:
+    """Process-wide cache of model sets, keyed by directory and reloaded only when the artifacts change.
+
+    A directory holding up-to-date compact artifacts (see ``compact_forest.py``) is served from
+    those; otherwise the joblib files are used. Artifacts are opened with ``mmap_mode`` so
+    uncompressed numpy buffers are read through the page cache rather than private copies.
+    ``prefer="joblib"`` ignores compact artifacts.
+    """
+
+    def __init__(self, mmap_mode="r", prefer="compact"):
+        self.mmap_mode = mmap_mode
+        self.prefer = prefer
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._sets = {}
+        self._version = 0
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.last_load_seconds = 0.0
+        self.hits = 0
+
+    def _signature(self, model_dir: Path) -> tuple:
+        sig = []
+        for fname in MODEL_FILES.values():
+            entry = [fname]
+            for path in (model_dir / fname, compact_path(model_dir / fname) / "meta.json"):
+                try:
+                    st = os.stat(path)
+                    entry.append((st.st_mtime_ns, st.st_size))
+                except FileNotFoundError:
+                    entry.append(None)
+            if entry[1] is None and entry[2] is None:
+                raise FileNotFoundError(f"no artifact for {fname} in {model_dir}")
+            sig.append(tuple(entry))
+        return tuple(sig)
+
+    def _format(self, model_dir: Path, signature) -> str:
+        # Compact artifacts are used only when all four exist and were exported from the
+        # joblib files currently on disk.
+        if self.prefer != "compact":
+            return "joblib"
+        for fname, source, meta in signature:
+            if meta is None:
+                return "joblib"
+            if source is not None:
+                meta_path = compact_path(model_dir / fname) / "meta.json"
+                exported = json.loads(meta_path.read_text()).get("source") or {}
+                if (exported.get("mtime_ns"), exported.get("size")) != source:
+                    return "joblib"
+        return "compact"
+
+    def _loaded(self, seconds) -> None:
+        with self._stats_lock:
+            self.load_count += 1
+            self.load_seconds += seconds
+            self.last_load_seconds = seconds
+
+    def get(self, model_dir=None) -> ModelSet:
+        model_dir = Path(model_dir).resolve() if model_dir is not None else default_model_dir()
+        with self._lock:
+            sig = self._signature(model_dir)
+            cached = self._sets.get(model_dir)
+            if cached is not None and cached.signature == sig:
+                self.hits += 1
+                return cached
+
+            self._version += 1
+            model_set = ModelSet(model_dir, self._format(model_dir, sig), sig, self._version, self)
+            self._sets[model_dir] = model_set
+            return model_set
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "load_count": self.load_count,
+                "load_seconds": self.load_seconds,
+                "last_load_seconds": self.last_load_seconds,
+                "cache_hits": self.hits,
+                "cached_dirs": [str(d) for d in self._sets],
+                "formats": {str(d): m.format for d, m in self._sets.items()},
+                "loaded_targets": {str(d): m.loaded for d, m in self._sets.items()},
+                "rss_bytes": rss_bytes(),
+            }
+
+
+REGISTRY = ModelRegistry()
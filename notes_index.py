@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list:
+    # Lower-cased alphanumeric runs: "QC out-of-spec" -> ["qc", "out", "of", "spec"].
+    return _TOKEN.findall(str(text).lower())
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    if not len(keys):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _join_groups(obs: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    # Most experiments have a single note; longer groups are joined one position at a
+    # time across all groups, so the Python-level loop runs max(notes per exp) times.
+    counts = np.diff(np.r_[starts, len(obs)])
+    joined = obs[starts].copy()
+    for j in range(1, counts.max() if len(counts) else 0):
+        more = counts > j
+        joined[more] = joined[more] + " " + obs[starts[more] + j]
+    return joined
+
+
+def _postings(values: np.ndarray, offset=0) -> dict:
+    # value -> sorted positions (plus offset) of the rows holding it.
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(uniques)))]
+    return {u: order[bounds[i]:bounds[i + 1]] + offset for i, u in enumerate(uniques)}
+
+
+def _token_postings(observations: np.ndarray, offset=0) -> dict:
+    # Only distinct observations are tokenized; the notes sharing one are expanded after.
+    by_text = _postings(observations, offset)
+    parts = {}
+    for text, rows in by_text.items():
+        for token in set(tokenize(text)):
+            parts.setdefault(token, []).append(rows)
+    return {token: np.sort(np.concatenate(rows)) for token, rows in parts.items()}
+
+
+def _merge(postings: dict, more: dict) -> None:
+    # New rows are appended after the existing ones, so concatenation stays sorted.
+    for key, rows in more.items():
+        postings[key] = np.concatenate([postings[key], rows]) if key in postings else rows
+
+
+class NotesIndex:
+    """Development notes pre-aggregated per experiment, with an inverted index over them.
+
+    Notes for one exp_id are joined in their original order; lookups are a binary search
+    over the sorted exp_ids. Observation tokens and review statuses map to posting lists of
+    note positions, so keyword / status queries are intersections of sorted arrays rather
+    than scans. ``append`` extends every structure with new notes in place.
+    """
+
+    def __init__(self, dev_notes_df: pd.DataFrame):
+        self.note_exp = np.empty(0, dtype=object)
+        self.note_ids = np.empty(0, dtype=object)
+        self.note_obs = np.empty(0, dtype=object)
+        self.note_status = np.empty(0, dtype=object)
+        self.exp_ids = np.empty(0, dtype=object)
+        self.observations = np.empty(0, dtype=object)
+        self.tokens = {}
+        self.statuses = {}
+        self._sorted = {}
+        self.append(dev_notes_df)
+
+    @property
+    def n_notes(self):
+        return len(self.note_exp)
+
+    def __len__(self):
+        return len(self.exp_ids)
+
+    def append(self, dev_notes_df: pd.DataFrame) -> "NotesIndex":
+        offset = self.n_notes
+        exp = dev_notes_df["exp_id"].to_numpy(dtype=object)
+        obs = dev_notes_df["observation"].to_numpy(dtype=object)
+        note_ids = (dev_notes_df["note_id"].to_numpy(dtype=object) if "note_id" in dev_notes_df
+                    else np.full(len(exp), None, dtype=object))
+        status = (dev_notes_df["review_status"].to_numpy(dtype=object) if "review_status" in dev_notes_df
+                  else np.full(len(exp), None, dtype=object))
+
+        order = np.argsort(exp, kind="stable")
+        starts = _group_starts(exp[order])
+        new_exp, joined = exp[order][starts], _join_groups(obs[order], starts)
+        if len(self.exp_ids) and len(new_exp):
+            pos = np.searchsorted(self.exp_ids, new_exp)
+            pos_ok = np.minimum(pos, len(self.exp_ids) - 1)
+            hit = self.exp_ids[pos_ok] == new_exp
+            self.observations[pos_ok[hit]] = self.observations[pos_ok[hit]] + " " + joined[hit]
+            self.exp_ids = np.insert(self.exp_ids, pos[~hit], new_exp[~hit])
+            self.observations = np.insert(self.observations, pos[~hit], joined[~hit])
+        elif len(new_exp):
+            self.exp_ids, self.observations = new_exp, joined
+
+        self.note_exp = np.concatenate([self.note_exp, exp])
+        self.note_ids = np.concatenate([self.note_ids, note_ids])
+        self.note_obs = np.concatenate([self.note_obs, obs])
+        self.note_status = np.concatenate([self.note_status, status])
+        _merge(self.tokens, _token_postings(obs, offset))
+        _merge(self.statuses, _postings(status, offset))
+        self._sorted.clear()
+        return self
+
+    def lookup(self, exp_ids, default=None) -> np.ndarray:
+        exp_ids = np.asarray(exp_ids, dtype=object)
+        out = np.full(len(exp_ids), default, dtype=object)
+        if not len(self.exp_ids):
+            return out
+        pos = np.searchsorted(self.exp_ids, exp_ids)
+        pos_ok = np.minimum(pos, len(self.exp_ids) - 1)
+        hit = self.exp_ids[pos_ok] == exp_ids
+        out[hit] = self.observations[pos_ok[hit]]
+        return out
+
+    def _positions(self, column, keys) -> np.ndarray:
+        # Posting lists for exp_id / note_id: the column sorted once (rebuilt after an
+        # append), then each key's run of equal values is found by binary search.
+        if column not in self._sorted:
+            values = getattr(self, column).astype(str)
+            order = np.argsort(values, kind="stable")
+            self._sorted[column] = order, values[order]
+        order, values = self._sorted[column]
+        keys = np.asarray([keys] if isinstance(keys, str) else list(keys), dtype=str)
+        lo = np.searchsorted(values, keys, side="left")
+        hi = np.searchsorted(values, keys, side="right")
+        counts = hi - lo
+        runs = np.repeat(lo - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+        return np.unique(order[runs])
+
+    def query(self, terms=None, status=None, exp_ids=None, note_ids=None) -> np.ndarray:
+        """Positions of the notes matching every given filter, in append order.
+
+        ``terms`` is a string or list of keywords (all must occur, after ``tokenize``);
+        ``status`` a review status or list of statuses (any may match).
+        """
+        result = None
+
+        def narrow(rows):
+            nonlocal result
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+        if terms is not None:
+            words = tokenize(terms) if isinstance(terms, str) else [w for t in terms for w in tokenize(t)]
+            # Shortest posting list first keeps every intersection small.
+            for rows in sorted((self.tokens.get(w, np.empty(0, dtype=np.intp)) for w in set(words)), key=len):
+                narrow(rows)
+        if status is not None:
+            status = [status] if isinstance(status, str) else list(status)
+            rows = [self.statuses[s] for s in status if s in self.statuses]
+            narrow(np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp))
+        if note_ids is not None:
+            narrow(self._positions("note_ids", note_ids))
+        if exp_ids is not None:
+            narrow(self._positions("note_exp", exp_ids))
+        return np.arange(self.n_notes) if result is None else result
+
+    def notes(self, **filters) -> pd.DataFrame:
+        # The matching notes as a frame, e.g. notes(terms="QC out-of-spec", status="approved").
+        rows = self.query(**filters)
+        return pd.DataFrame({
+            "note_id": self.note_ids[rows],
+            "exp_id": self.note_exp[rows],
+            "observation": self.note_obs[rows],
+            "review_status": self.note_status[rows],
+        })
+
+    def experiments(self, **filters) -> np.ndarray:
+        # Sorted distinct exp_ids with at least one matching note.
+        return np.unique(self.note_exp[self.query(**filters)])
@@ -1,13 +1,29 @@
+import numpy as np
 import pandas as pd
 
-def orchestrate(proposals: pd.DataFrame, policy="balanced") -> pd.DataFrame:
-    df = proposals.copy()
-    if policy == "speed_to_clinic":
-        w_perm, w_stab, w_irr, w_fail = 0.60, 0.20, 0.10, 0.25
-    elif policy == "low_risk":
-        w_perm, w_stab, w_irr, w_fail = 0.30, 0.55, 0.15, 0.30
-    else:
-        w_perm, w_stab, w_irr, w_fail = 0.45, 0.35, 0.15, 0.20
+from pareto import frontier_frame
+from tracing import traced
+
+# name -> (w_perm, w_stab, w_irr, w_fail)
+POLICIES = {
+    "balanced": (0.45, 0.35, 0.15, 0.20),
+    "speed_to_clinic": (0.60, 0.20, 0.10, 0.25),
+    "low_risk": (0.30, 0.55, 0.15, 0.30),
+}
+
+
+def policy_weights(policy):
+    # A registered name (unknown names fall back to balanced) or an explicit weight tuple.
+    if isinstance(policy, str):
+        return POLICIES.get(policy, POLICIES["balanced"])
+    return tuple(float(w) for w in policy)
+
+
+@traced("orchestrate")
+def orchestrate(proposals: pd.DataFrame, policy="balanced", frontier=False) -> pd.DataFrame:
+    # frontier=True ranks only the Pareto-optimal proposals.
+    df = frontier_frame(proposals) if frontier else proposals.copy()
+    w_perm, w_stab, w_irr, w_fail = policy_weights(policy)
 
     df["policy_score"] = (
         w_perm*(df["pred_permeability"]/100) +
@@ -16,3 +32,115 @@ def orchestrate(proposals: pd.DataFrame, policy="balanced") -> pd.DataFrame:
         w_fail*(df["pred_qc_fail_prob"])
     )
     return df.sort_values("policy_score", ascending=False).reset_index(drop=True)
+
+
+def metric_matrix(proposals: pd.DataFrame) -> np.ndarray:
+    # Columns line up with the weight tuples; penalties are negated so scores = M @ W.
+    return np.column_stack([
+        proposals["pred_permeability"].to_numpy()/100,
+        proposals["pred_stability"].to_numpy()/365,
+        -proposals["pred_irritation"].to_numpy(),
+        -proposals["pred_qc_fail_prob"].to_numpy(),
+    ])
+
+
+def _inversions(seq: np.ndarray) -> np.ndarray:
+    # Inversion count of every row of a (P, n) array of permutations of 0..n-1, by a
+    # bottom-up merge sort run on all rows at once. Cross-block pairs are counted with one
+    # searchsorted per level over keys offset by block, so there is no per-row loop.
+    P, n = seq.shape
+    N = 1 << max(n - 1, 0).bit_length()
+    a = np.empty((P, N), dtype=np.int64)
+    a[:, :n] = seq
+    a[:, n:] = np.arange(n, N)  # larger than every value and increasing: adds no inversions
+    inv = np.zeros(P, dtype=np.int64)
+    w = 1
+    while w < N:
+        blocks = a.reshape(P, N // (2*w), 2, w)
+        gid = np.arange(P * (N // (2*w)), dtype=np.int64).reshape(P, N // (2*w), 1)
+        left = (gid * N + blocks[:, :, 0, :]).ravel()
+        right = (gid * N + blocks[:, :, 1, :]).ravel()
+        not_greater = np.searchsorted(left, right, side="right") - np.repeat(gid.ravel() * w, w)
+        inv += (w - not_greater).reshape(P, -1).sum(axis=1)
+        a = np.sort(a.reshape(P, N // (2*w), 2*w), axis=-1).reshape(P, N)
+        w *= 2
+    return inv
+
+
+class PolicyComparison:
+    """Scores and rankings for many policies over one proposal set.
+
+    ``scores`` is the (n, P) product of the metric matrix and the (4, P) weight matrix;
+    ``ranks[i, p]`` is the 0-based position of proposal i under policy p. Rank-shift
+    statistics are relative to the ``reference`` policy.
+    """
+
+    def __init__(self, proposals, policies, reference=None):
+        self.proposals = proposals
+        self.names = list(policies)
+        self.weights = np.array([policy_weights(policies[name]) for name in self.names]).T
+        self.reference = self.names[0] if reference is None else reference
+        self.ref = self.names.index(self.reference)
+
+        self.scores = metric_matrix(proposals) @ self.weights
+        self.order = np.argsort(-self.scores, axis=0, kind="stable")
+        self.ranks = np.empty_like(self.order)
+        np.put_along_axis(self.ranks, self.order, np.arange(len(proposals))[:, None], axis=0)
+
+    def ranking(self, policy, top=None) -> pd.DataFrame:
+        p = self.names.index(policy)
+        idx = self.order[:top, p]
+        df = self.proposals.iloc[idx].reset_index(drop=True)
+        df["policy_score"] = self.scores[idx, p]
+        return df
+
+    def kendall_tau(self) -> np.ndarray:
+        n = len(self.proposals)
+        if n < 2:
+            return np.ones(len(self.names))
+        seq = self.ranks[self.order[:, self.ref]].T
+        return 1 - 4 * _inversions(seq) / (n * (n - 1))
+
+    def stats(self, top_k=8) -> pd.DataFrame:
+        k = min(top_k, len(self.proposals))
+        in_top = self.ranks < k
+        shift = self.ranks - self.ranks[:, [self.ref]]
+        return pd.DataFrame({
+            "kendall_tau": self.kendall_tau(),
+            f"top_{top_k}_overlap": (in_top & in_top[:, [self.ref]]).sum(axis=0) / max(k, 1),
+            "mean_abs_shift": np.abs(shift).mean(axis=0) if len(shift) else 0.0,
+            "max_abs_shift": np.abs(shift).max(axis=0) if len(shift) else 0,
+        }, index=pd.Index(self.names, name="policy"))
+
+    def movers(self, n=5, id_column="proposal_id") -> pd.DataFrame:
+        # The n proposals whose rank moves most against the reference, for every policy.
+        shift = self.ranks - self.ranks[:, [self.ref]]
+        m = min(n, len(shift))
+        if m == 0:
+            return pd.DataFrame(columns=["policy", id_column, "reference_rank", "rank", "shift"])
+        mag = np.abs(shift)
+        idx = np.argpartition(-mag, m - 1, axis=0)[:m] if m < len(shift) else np.argsort(-mag, axis=0)
+        idx = np.take_along_axis(idx, np.argsort(-np.take_along_axis(mag, idx, axis=0), axis=0, kind="stable"), axis=0)
+        cols = np.broadcast_to(np.arange(len(self.names)), idx.shape)
+        rows = idx.T.ravel()
+        pcol = cols.T.ravel()
+        ids = self.proposals[id_column].to_numpy()[rows] if id_column in self.proposals else rows
+        return pd.DataFrame({
+            "policy": np.asarray(self.names, dtype=object)[pcol],
+            id_column: ids,
+            "reference_rank": self.ranks[rows, self.ref] + 1,
+            "rank": self.ranks[rows, pcol] + 1,
+            "shift": shift[rows, pcol],
+        })
+
+
+@traced("orchestrate_many")
+def orchestrate_many(proposals: pd.DataFrame, policies=None, reference=None, frontier=False) -> PolicyComparison:
+    # policies: a list of registered names, or a mapping of name -> name / weight tuple.
+    if frontier:
+        proposals = frontier_frame(proposals)
+    if policies is None:
+        policies = list(POLICIES)
+    if not isinstance(policies, dict):
+        policies = {name: name for name in policies}
+    return PolicyComparison(proposals, policies, reference)
@@ -0,0 +1,127 @@
+"""Non-dominated (Pareto) filtering of scored candidates.
+
+Objectives follow ``scoring.PRED_COLUMNS``: permeability and stability are maximized,
+irritation and QC-fail probability minimized. ``nondominated`` is a blocked sort-filter
+skyline: rows are sorted so that a dominating row always comes first (sum of the
+standardized objectives, ties broken lexicographically), which means a row only has to be
+checked against the frontier found so far and never removes an earlier one. Large inputs
+are merged chunk by chunk into a running frontier, the same way ``ParetoFrontier`` does it
+across calls. Most rows are rejected by the first few frontier rows they are compared with
+(``dominated_by`` compares against a doubling prefix of the frontier); a row that survives
+is compared with the whole frontier, so the cost is candidates times the frontier rows each
+one needs: close to linear while the frontier stays small, not in general.
+"""
+import numpy as np
+import pandas as pd
+
+from scoring import PRED_COLUMNS
+
+# +1: larger is better, -1: smaller is better (PRED_COLUMNS order)
+SENSE = np.array([1.0, -1.0, 1.0, -1.0])
+
+
+def to_minimize(P) -> np.ndarray:
+    return np.asarray(P, dtype=np.float64) * -SENSE
+
+
+def dominated_by(Q, R, block_rows=1 << 22, first=16) -> np.ndarray:
+    # True for each row of Q dominated by at least one row of R (both "smaller is better").
+    # R is taken in steps that start at `first` rows and double (at most block_rows
+    # comparisons each), and rows of Q drop out as soon as they are dominated: when R is a
+    # frontier, its first rows already dominate most of Q and the later steps see few rows.
+    out = np.zeros(len(Q), dtype=bool)
+    if not len(R) or not len(Q):
+        return out
+    alive = np.arange(len(Q))
+    start, step = 0, first
+    while start < len(R):
+        step = max(1, min(step, block_rows // len(alive)))
+        Rb = R[start:start + step]
+        Qa = Q[alive]
+        # One 2-D comparison per objective; reducing a 3-D array over its short last axis
+        # is several times slower.
+        le = Rb[:, 0] <= Qa[:, 0, np.newaxis]
+        lt = Rb[:, 0] < Qa[:, 0, np.newaxis]
+        for k in range(1, Q.shape[1]):
+            col = Qa[:, k, np.newaxis]
+            le &= Rb[:, k] <= col
+            lt |= Rb[:, k] < col
+        dom = (le & lt).any(axis=1)
+        out[alive[dom]] = True
+        alive = alive[~dom]
+        if not len(alive):
+            break
+        start += step
+        step *= 2
+    return out
+
+
+def _sort_order(F):
+    scale = F.std(axis=0)
+    scale[scale == 0] = 1.0
+    key = (F / scale).sum(axis=1)
+    return np.lexsort(tuple(F.T[::-1]) + (key,))
+
+
+def _skyline(F, block) -> np.ndarray:
+    # Positions of the non-dominated rows of F, best first (in _sort_order).
+    order = _sort_order(F)
+    front = np.empty(0, dtype=np.int64)
+    for start in range(0, len(order), block):
+        idx = order[start:start + block]
+        idx = idx[~dominated_by(F[idx], F[front])]
+        # Within the block only earlier rows can dominate later ones; checking all pairs is simpler.
+        idx = idx[~dominated_by(F[idx], F[idx])]
+        front = np.concatenate([front, idx])
+    return front
+
+
+def nondominated(F, block=4096, chunk=65536) -> np.ndarray:
+    """Indices of the non-dominated rows of ``F`` (every column minimized), in input order.
+
+    Inputs longer than ``chunk`` rows are merged chunk by chunk as in ``ParetoFrontier``:
+    each chunk is filtered against the frontier so far, then the frontier of the (small)
+    union is recomputed, so only the union is ever sorted. The frontier is kept in input
+    order; a prefix of it spans the frontier better than a best-first one, which is what
+    ``dominated_by`` checks first.
+    """
+    F = np.asarray(F, dtype=np.float64)
+    front = np.empty(0, dtype=np.int64)
+    for start in range(0, len(F), chunk):
+        idx = np.arange(start, min(start + chunk, len(F)))
+        idx = idx[~dominated_by(F[idx], F[front])]
+        union = np.concatenate([front, idx])
+        front = np.sort(union[_skyline(F[union], block)])
+    return front
+
+
+class ParetoFrontier:
+    """Frontier maintained incrementally over chunks of scored candidates.
+
+    ``update`` drops new rows dominated by the current frontier, then recomputes the
+    frontier of the (small) union, so memory is bounded by the frontier size rather than
+    the number of candidates seen.
+    """
+
+    def __init__(self, n_features, n_objectives=len(PRED_COLUMNS)):
+        self.X = np.empty((0, n_features))
+        self.P = np.empty((0, n_objectives))
+        self.seen = 0
+
+    def __len__(self):
+        return len(self.P)
+
+    def update(self, X, P) -> "ParetoFrontier":
+        self.seen += len(P)
+        keep = ~dominated_by(to_minimize(P), to_minimize(self.P))
+        X = np.concatenate([self.X, X[keep]])
+        P = np.concatenate([self.P, P[keep]])
+        front = nondominated(to_minimize(P))
+        self.X, self.P = X[front], P[front]
+        return self
+
+
+def frontier_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Rows of a scored frame (proposals, pools) that lie on the Pareto frontier.
+    keep = nondominated(to_minimize(df[PRED_COLUMNS].to_numpy()))
+    return df.iloc[keep].reset_index(drop=True)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from agents import FEATURES, constraint_mask, proposal_frame, sample_candidates, top_n_indices, utility
+from lru_cache import BoundedLRU
+from pareto import ParetoFrontier
+from scoring import PRED_COLUMNS
+from tracing import span
+
+
+class ScoredPoolCache:
+    """LRU cache of fully scored candidate pools in front of FormulationIntelligenceAgent.
+
+    A pool is keyed by (model dir, model version, seed, n_candidates, chunk_size) and holds
+    every candidate with its four predictions and utility. Changing constraints then only
+    re-filters and re-ranks the pool. Entries for a model directory are dropped as soon as
+    the registry hands out a newer version of its models.
+    """
+
+    def __init__(self, max_entries=16, max_bytes=256 * 2**20):
+        self._cache = BoundedLRU(max_entries, max_bytes)
+
+    def _build(self, agent, seed, n_candidates, chunk_size):
+        # Same draw sequence as propose_next_experiments for this (seed, chunk_size).
+        rng = np.random.default_rng(seed)
+        X = np.empty((n_candidates, len(FEATURES)))
+        P = np.empty((n_candidates, len(PRED_COLUMNS)))
+        for start in range(0, n_candidates, chunk_size):
+            stop = min(start + chunk_size, n_candidates)
+            X[start:stop] = sample_candidates(rng, stop - start)
+            agent.score_array(X[start:stop], out=P[start:stop])
+        return X, P, utility(P)
+
+    def pool(self, agent, seed=7, n_candidates=600, chunk_size=65536):
+        models = agent.models
+        key = (str(models.model_dir), models.version, seed, int(n_candidates), int(chunk_size))
+        self._cache.retire(key[0], key[1])
+        entry = self._cache.get(key)
+        if entry is None:
+            with span("pool_build", rows=int(n_candidates), seed=seed):
+                entry = self._build(agent, seed, int(n_candidates), int(chunk_size))
+            self._cache.put(key, entry)
+        return entry
+
+    def propose(self, agent, n=10, seed=7, constraints=None, n_candidates=600, chunk_size=65536) -> pd.DataFrame:
+        # Same result as agent.propose_next_experiments with these arguments.
+        X, P, u = self.pool(agent, seed, n_candidates, chunk_size)
+        keep = np.flatnonzero(constraint_mask(P, constraints))
+        top = keep[top_n_indices(u[keep], n)]
+        return proposal_frame(X[top], P[top], u[top])
+
+    def frontier(self, agent, seed=7, constraints=None, n_candidates=600, chunk_size=65536) -> pd.DataFrame:
+        # Same result as agent.propose_next_experiments(strategy="pareto") with these arguments.
+        X, P, u = self.pool(agent, seed, n_candidates, chunk_size)
+        keep = constraint_mask(P, constraints)
+        front = ParetoFrontier(len(FEATURES))
+        with span("pareto_frontier", rows=int(keep.sum())) as sp:
+            for start in range(0, len(P), chunk_size):
+                sel = keep[start:start + chunk_size]
+                front.update(X[start:start + chunk_size][sel], P[start:start + chunk_size][sel])
+            sp.set(frontier=len(front))
+        return proposal_frame(front.X, front.P, utility(front.P))
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
@@ -0,0 +1,203 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import sklearn
+
+import tracing
+
+
+TARGETS = ("perm", "irr", "stab", "fail")
+PRED_COLUMNS = ["pred_permeability", "pred_irritation", "pred_stability", "pred_qc_fail_prob"]
+CLIP = {"irr": (0, 1), "stab": (15, 365)}
+# constraint name -> (target, comparison a prediction must pass against the limit)
+CONSTRAINTS = {
+    "max_irritation": ("irr", np.less_equal),
+    "min_stability": ("stab", np.greater_equal),
+    "max_fail_prob": ("fail", np.less_equal),
+}
+
+# scikit-learn < 1.4 stores class counts in tree_.value and normalizes them in predict_proba;
+# newer releases store the fractions directly.
+_NORMALIZE_PROBA = tuple(int(p) for p in sklearn.__version__.split(".")[:2]) < (1, 4)
+
+
+def _leaf_values(estimator, classifier):
+    value = estimator.tree_.value[:, 0, :]
+    if not classifier:
+        return np.ascontiguousarray(value[:, 0])
+    proba = value[:, : estimator.n_classes_]
+    if _NORMALIZE_PROBA:
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba = proba / normalizer
+    return np.ascontiguousarray(proba[:, 1])
+
+
+class _TreeTable(dict):
+    # target -> [(tree_, leaf_values), ...], filled the first time a target is scored so
+    # lazily loaded model sets only materialize the targets that are used.
+    def __init__(self, models):
+        super().__init__()
+        self.models = models
+
+    def __missing__(self, key):
+        forest = self.models[key]
+        if hasattr(forest, "tree_pairs"):  # compact_forest.CompactForest
+            pairs = forest.tree_pairs()
+        else:
+            pairs = [(e.tree_, _leaf_values(e, key == "fail")) for e in forest.estimators_]
+        return self.setdefault(key, pairs)
+
+
+class ForestScorer:
+    """Scores the four forests, one target and one tree at a time, over blocks of rows.
+
+    Every tree is reduced to ``(tree_, leaf_values)`` when its target is first scored, so a
+    prediction is an ``apply`` plus a gather. Rows are split into blocks that run on a
+    thread pool (``apply`` releases the GIL); within a block trees are accumulated in
+    estimator order, so results are bit-identical to ``predict`` / ``predict_proba``.
+    On one thread it walks the same trees as ``predict`` and is not faster; see
+    benchmarks/bench_scorer.py.
+    """
+
+    def __init__(self, models, n_jobs=None, block_rows=16384):
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.block_rows = block_rows
+        self.trees = _TreeTable(models)
+        self._pool = None
+
+    def _predict_block(self, X32, keys, out, std_out=None, timings=None):
+        acc = np.empty(X32.shape[0], dtype=np.float64)
+        sq = np.empty_like(acc) if std_out is not None else None
+        for j, key in enumerate(keys):
+            t0 = time.perf_counter() if timings is not None else 0.0
+            trees = self.trees[key]
+            acc[:] = 0.0
+            if sq is None:
+                for tree, values in trees:
+                    acc += values[tree.apply(X32)]
+            else:
+                sq[:] = 0.0
+                for tree, values in trees:
+                    v = values[tree.apply(X32)]
+                    acc += v
+                    sq += v * v
+            acc /= len(trees)
+            if sq is not None:
+                # spread of the individual trees around the (unclipped) forest mean
+                std_out[:, j] = np.sqrt(np.maximum(sq / len(trees) - acc * acc, 0.0))
+            if key in CLIP:
+                np.clip(acc, *CLIP[key], out=acc)
+            out[:, j] = acc
+            if timings is not None:
+                timings[j] += time.perf_counter() - t0
+
+    def predict(self, X, keys=TARGETS, out=None, std_out=None) -> np.ndarray:
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        n = X32.shape[0]
+        if out is None:
+            out = np.empty((n, len(keys)), dtype=np.float64)
+        for key in keys:
+            self.trees[key]  # load here rather than racing in the worker threads
+        blocks = [(s, min(s + self.block_rows, n)) for s in range(0, n, self.block_rows)]
+        # Per-target time, summed over blocks (and threads), is reported as one span each.
+        timings = [np.zeros(len(keys)) for _ in blocks] if tracing.enabled() else [None] * len(blocks)
+        if self.n_jobs > 1 and len(blocks) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.n_jobs)
+            futures = [
+                self._pool.submit(
+                    self._predict_block, X32[s:e], keys, out[s:e],
+                    None if std_out is None else std_out[s:e], t,
+                )
+                for (s, e), t in zip(blocks, timings)
+            ]
+            for f in futures:
+                f.result()
+        else:
+            for (s, e), t in zip(blocks, timings):
+                self._predict_block(X32[s:e], keys, out[s:e], None if std_out is None else std_out[s:e], t)
+        if tracing.enabled() and blocks:
+            for j, key in enumerate(keys):
+                tracing.record("predict", sum(t[j] for t in timings), target=key, rows=n)
+        return out
+
+    def score_array(self, X, out=None) -> np.ndarray:
+        return self.predict(X, TARGETS, out)
+
+    def score_with_std(self, X):
+        # Mean predictions (identical to score_array) plus the per-target standard deviation
+        # across trees, used as an uncertainty estimate.
+        n = len(X)
+        std = np.empty((n, len(TARGETS)), dtype=np.float64)
+        return self.predict(X, TARGETS, std_out=std), std
+
+
+class ConstraintCascade:
+    """Scores constrained targets first and only passes survivors on to the next model.
+
+    Stages are ordered by expected cost per pruned row (tree count over observed rejection
+    rate), re-estimated after every ``run``, so the cheapest, most selective check goes first.
+    Targets without a constraint are scored last, on the final survivors only. Pruned rows
+    are left as NaN in ``out``.
+    """
+
+    def __init__(self, scorer, constraints):
+        self.scorer = scorer
+        self.stages = [
+            (name, key, op, constraints[name])
+            for name, (key, op) in CONSTRAINTS.items()
+            if name in constraints
+        ]
+        constrained = {key for _, key, _, _ in self.stages}
+        self.free = tuple(k for k in TARGETS if k not in constrained)
+        self.stats = {
+            name: {"target": key, "rows_in": 0, "rows_pruned": 0, "seconds": 0.0}
+            for name, key, _, _ in self.stages
+        }
+        self.stats["unconstrained"] = {"target": ",".join(self.free), "rows_in": 0, "rows_pruned": 0, "seconds": 0.0}
+
+    def _expected_cost(self, stage):
+        name, key, _, _ = stage
+        st = self.stats[name]
+        reject = st["rows_pruned"] / st["rows_in"] if st["rows_in"] else 0.5
+        return len(self.scorer.trees[key]) / max(reject, 1e-3)
+
+    def run(self, X, out) -> np.ndarray:
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        out[:] = np.nan
+        idx = np.arange(len(X32))
+        for stage in sorted(self.stages, key=self._expected_cost):
+            if not len(idx):
+                break
+            name, key, op, limit = stage
+            t0 = time.perf_counter()
+            pred = self.scorer.predict(X32[idx], (key,))[:, 0]
+            col = TARGETS.index(key)
+            out[idx, col] = pred
+            ok = op(pred, limit)
+            st = self.stats[name]
+            st["rows_in"] += len(idx)
+            st["rows_pruned"] += int(len(idx) - ok.sum())
+            st["seconds"] += time.perf_counter() - t0
+            tracing.record("cascade_stage", time.perf_counter() - t0, stage=name,
+                           rows=len(idx), pruned=int(len(idx) - ok.sum()))
+            idx = idx[ok]
+
+        if self.free and len(idx):
+            t0 = time.perf_counter()
+            pred = self.scorer.predict(X32[idx], self.free)
+            for j, key in enumerate(self.free):
+                out[idx, TARGETS.index(key)] = pred[:, j]
+            st = self.stats["unconstrained"]
+            st["rows_in"] += len(idx)
+            st["seconds"] += time.perf_counter() - t0
+
+        keep = np.zeros(len(X32), dtype=bool)
+        keep[idx] = True
+        return keep
+
+    def report(self) -> list:
+        return [{"stage": name, **st} for name, st in self.stats.items()]
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from agents import FEATURES
+from lru_cache import BoundedLRU
+from scoring import PRED_COLUMNS
+from tracing import span
+
+
+# Default sweep range per feature: the bounds agents.sample_candidates draws from
+# (viscosity is lognormal there; this covers roughly its 2nd to 98th percentile).
+FEATURE_RANGES = {
+    "api_load": (0.1, 5.0),
+    "solvent_ratio": (0.0, 1.0),
+    "polymer_pct": (0.0, 8.0),
+    "surfactant_pct": (0.0, 3.0),
+    "ph": (4.0, 8.0),
+    "viscosity": (6.0, 38.0),
+    "process_temp": (18.0, 45.0),
+    "mix_time": (2.0, 45.0),
+}
+
+
+def sweep_grid(bases: np.ndarray, features, axes) -> np.ndarray:
+    # (B, r1[, r2], 8) copies of every base row with the swept features replaced by the grid;
+    # the first swept feature varies along axis 1, the second along axis 2.
+    shape = (len(bases),) + tuple(len(axis) for axis in axes)
+    X = np.empty(shape + (len(FEATURES),))
+    X[...] = bases.reshape((len(bases),) + (1,) * len(features) + (len(FEATURES),))
+    for d, (name, axis) in enumerate(zip(features, axes)):
+        view = [1] * len(features)
+        view[d] = len(axis)
+        X[..., FEATURES.index(name)] = axis.reshape(view)
+    return X
+
+
+class Sweep:
+    """Predictions over a 1-D or 2-D feature grid around one or more base formulations.
+
+    ``values[b, i]`` (1-D) or ``values[b, i, j]`` (2-D) holds the four predictions, in
+    PRED_COLUMNS order, for base ``b`` with ``features[0] = axes[0][i]`` (and
+    ``features[1] = axes[1][j]``).
+    """
+
+    def __init__(self, bases, features, axes, values):
+        self.bases = bases
+        self.features = list(features)
+        self.axes = axes
+        self.values = values
+
+    def frame(self, labels=None) -> pd.DataFrame:
+        # Long format for charting: one row per (base, grid point).
+        B = len(self.bases)
+        points = self.values.shape[1:-1]
+        mesh = np.meshgrid(*self.axes, indexing="ij")
+        df = pd.DataFrame({
+            "base": np.repeat(np.arange(B) if labels is None else np.asarray(labels), np.prod(points)),
+            **{name: np.tile(m.ravel(), B) for name, m in zip(self.features, mesh)},
+        })
+        df[PRED_COLUMNS] = self.values.reshape(-1, len(PRED_COLUMNS))
+        return df
+
+
+class SensitivitySweeper:
+    """Batched what-if sweeps with an LRU cache of per-base results.
+
+    A result is keyed by (model dir, model version, base row, features, ranges, resolution).
+    All bases missing from the cache are expanded into one grid array and scored in a single
+    pass of the four models.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 2**20):
+        self._cache = BoundedLRU(max_entries, max_bytes)
+
+    def sweep(self, agent, bases, features, ranges=None, resolution=50) -> Sweep:
+        # bases: a frame with FEATURES columns, a single row (Series / 1-D array) or a 2-D
+        # array in FEATURES order. ranges defaults to FEATURE_RANGES for each feature.
+        if isinstance(features, str):
+            features = [features]
+        features = tuple(features)
+        if not 1 <= len(features) <= 2 or len(set(features)) != len(features):
+            raise ValueError("sweep one feature or two different features")
+        unknown = [name for name in features if name not in FEATURES]
+        if unknown:
+            raise ValueError(f"unknown features: {unknown}")
+        if ranges is None:
+            ranges = [FEATURE_RANGES[name] for name in features]
+        ranges = tuple((float(lo), float(hi)) for lo, hi in ranges)
+        resolution = int(resolution)
+        axes = [np.linspace(lo, hi, resolution) for lo, hi in ranges]
+        if isinstance(bases, (pd.DataFrame, pd.Series)):
+            bases = bases[FEATURES].to_numpy(dtype=np.float64)
+        bases = np.atleast_2d(np.asarray(bases, dtype=np.float64))
+
+        models = agent.models
+        scope = (str(models.model_dir), models.version)
+        keys = [scope + (row.tobytes(), features, ranges, resolution) for row in bases]
+        shape = (resolution,) * len(features) + (len(PRED_COLUMNS),)
+        values = np.empty((len(bases),) + shape)
+        missing = []
+        self._cache.retire(*scope)
+        for b, key in enumerate(keys):
+            entry = self._cache.get(key)
+            if entry is None:
+                missing.append(b)
+            else:
+                values[b] = entry
+
+        if missing:
+            X = sweep_grid(bases[missing], features, axes)
+            with span("sensitivity_sweep", rows=X[..., 0].size, bases=len(missing)):
+                P = agent.score_array(X.reshape(-1, len(FEATURES)))
+            values[missing] = P.reshape((len(missing),) + shape)
+            for b in missing:
+                self._cache.put(keys[b], values[b].copy())
+
+        return Sweep(bases, features, axes, values)
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
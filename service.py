@@ -0,0 +1,236 @@
+"""Headless local scoring service.
+
+    python service.py --model-dir models --port 8765 --max-batch 4096 --max-wait-ms 5
+
+Endpoints (JSON in, JSON out):
+    POST /score        {"rows": [{feature: value, ...}, ...]}  or  {"X": [[8 floats], ...]}
+    POST /propose      {"n": 12, "seed": 7, "constraints": {...}, "n_candidates": 600}
+    POST /orchestrate  {"proposals": [...], "policy": "balanced" | [w_perm, w_stab, w_irr, w_fail]}
+    GET  /stats, GET /health
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from agents import FEATURES, FormulationIntelligenceAgent
+from model_registry import REGISTRY
+from orchestrator import orchestrate
+from pool_cache import ScoredPoolCache
+from scoring import PRED_COLUMNS
+
+
+class MicroBatcher:
+    """Coalesces concurrent score requests into one model call.
+
+    The first queued request opens a batch; more requests are added until ``max_batch`` rows
+    are collected or ``max_wait`` seconds have passed. The batch is scored on the executor
+    and every caller gets back its own slice.
+    """
+
+    def __init__(self, score_fn, executor, max_batch=4096, max_wait=0.005):
+        self.score_fn = score_fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.max_queue_depth = 0
+        self.batch_histogram = {}  # power-of-two upper bound -> batch count
+        self.busy_seconds = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, X: np.ndarray) -> np.ndarray:
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, fut))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            X = np.concatenate([x for x, _ in batch]) if len(batch) > 1 else batch[0][0]
+            t0 = time.perf_counter()
+            try:
+                preds = await loop.run_in_executor(self.executor, self.score_fn, X)
+            except Exception as exc:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            self.busy_seconds += time.perf_counter() - t0
+
+            start = 0
+            for x, fut in batch:
+                if not fut.done():
+                    fut.set_result(preds[start:start + len(x)])
+                start += len(x)
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += rows
+            bucket = 1 << max(rows - 1, 0).bit_length()
+            self.batch_histogram[bucket] = self.batch_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "requests": self.requests,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "batch_rows_histogram": {f"<={k}": v for k, v in sorted(self.batch_histogram.items())},
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+class ScoringService:
+    def __init__(self, model_dir=None, max_batch=4096, max_wait=0.005, workers=2):
+        self.model_dir = model_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pool_cache = ScoredPoolCache()
+        self.batcher = MicroBatcher(self._score, self.executor, max_batch, max_wait)
+        REGISTRY.get(model_dir).preload()  # load the shared model set before accepting connections
+
+    def agent(self) -> FormulationIntelligenceAgent:
+        # Cheap: the registry returns the cached model set unless the artifacts changed.
+        return FormulationIntelligenceAgent(self.model_dir)
+
+    def _score(self, X):
+        return self.agent().score_array(X)
+
+    def _propose(self, body):
+        return self.pool_cache.propose(
+            self.agent(),
+            n=int(body.get("n", 10)),
+            seed=int(body.get("seed", 7)),
+            constraints=body.get("constraints"),
+            n_candidates=int(body.get("n_candidates", 600)),
+        )
+
+    async def handle_score(self, body):
+        if "X" in body:
+            X = np.asarray(body["X"], dtype=np.float64).reshape(-1, len(FEATURES))
+        else:
+            X = pd.DataFrame(body["rows"])[FEATURES].to_numpy(dtype=np.float64)
+        preds = await self.batcher.submit(X)
+        return {"columns": PRED_COLUMNS, "predictions": preds.tolist()}
+
+    async def handle_propose(self, body):
+        loop = asyncio.get_running_loop()
+        proposals = await loop.run_in_executor(self.executor, self._propose, body)
+        if body.get("policy") is not None:
+            proposals = await loop.run_in_executor(self.executor, orchestrate, proposals, body["policy"])
+        return {"proposals": proposals.to_dict(orient="records")}
+
+    async def handle_orchestrate(self, body):
+        # Ranking a large proposal set is CPU work; keep it off the event loop.
+        proposals = pd.DataFrame(body["proposals"])
+        ranked = await asyncio.get_running_loop().run_in_executor(
+            self.executor, orchestrate, proposals, body.get("policy", "balanced"))
+        return {"ranked": ranked.to_dict(orient="records")}
+
+    def handle_stats(self):
+        return {"batcher": self.batcher.stats(), "models": REGISTRY.stats(), "pool_cache": self.pool_cache.stats()}
+
+    async def dispatch(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok"}
+        if method == "GET" and path == "/stats":
+            return HTTPStatus.OK, self.handle_stats()
+        routes = {
+            "/score": self.handle_score,
+            "/propose": self.handle_propose,
+            "/orchestrate": self.handle_orchestrate,
+        }
+        if method == "POST" and path in routes:
+            try:
+                return HTTPStatus.OK, await routes[path](json.loads(body or b"{}"))
+            except (KeyError, ValueError, TypeError) as exc:
+                return HTTPStatus.BAD_REQUEST, {"error": f"{type(exc).__name__}: {exc}"}
+            except Exception as exc:  # model reloads, scorer failures passed back by the batcher
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+        return HTTPStatus.NOT_FOUND, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.dispatch(method, path.split("?")[0], body)
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"scoring service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Local micro-batching scoring service.")
+    p.add_argument("--model-dir", default=None)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--max-batch", type=int, default=4096, help="max rows per model call")
+    p.add_argument("--max-wait-ms", type=float, default=5.0, help="max time a request waits for a batch to fill")
+    p.add_argument("--workers", type=int, default=2,
+                   help="threads for /score batches, /propose and /orchestrate; /score runs one batch "
+                        "at a time, parallelized across cores by the scorer itself")
+    args = p.parse_args(argv)
+    service = ScoringService(args.model_dir, args.max_batch, args.max_wait_ms / 1000, args.workers)
+    asyncio.run(service.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
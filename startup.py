@@ -0,0 +1,164 @@
+"""Background warm-up for the app's cold start.
+
+``start()`` runs the startup steps on a daemon thread, so importing pandas / scikit-learn,
+preparing the experiment data, loading the models and scoring the default candidate pool
+overlap with the login gate. ``wait(step)`` returns a step's result, running it (and the
+steps it needs) in the caller if the background thread has not got there yet, so the app
+behaves the same with ``AGENTIC_PRELOAD=0``.
+
+This module only imports the standard library at the top, so importing it is free.
+"""
+import contextlib
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+T0 = time.perf_counter()
+STORE_DIR = os.environ.get("EXPERIMENT_STORE", str(Path(__file__).resolve().parent / "experiment_store"))
+PRELOAD = os.environ.get("AGENTIC_PRELOAD", "1") != "0"
+
+# name -> {"start": seconds since T0, "seconds": duration, "thread": "background" | "foreground"}
+PHASES = {}
+_results = {}
+_phase_lock = threading.Lock()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def _imports():
+    import pandas  # noqa: F401
+    import agents  # noqa: F401  (numpy, scikit-learn, joblib via the registry)
+    import authoring  # noqa: F401
+    import orchestrator  # noqa: F401
+    import pool_cache  # noqa: F401
+
+
+# Seed rows are written under this part name, so a seed rerun after a crash overwrites the
+# same files instead of adding a second copy.
+SEED_PART = "seed"
+
+
+@contextlib.contextmanager
+def _store_lock(root):
+    # Serializes seeding across processes sharing a store (a no-op without fcntl).
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".seed.lock", "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _seed_table(store, table, make):
+    # Writes make() as the table's seed unless it was seeded already (the marker is written
+    # last) or holds rows from anywhere else.
+    marker = store.root / f".{table}.seeded"
+    if marker.exists():
+        return
+    parts = (store.root / table).rglob("*.parquet")
+    if any(not f.name.startswith(f"part-{SEED_PART}") for f in parts):
+        return
+    store.append(table, make(), part_name=SEED_PART)
+    marker.touch()
+
+
+def _data():
+    from data_gen import generate_synthetic_dev_notes, generate_synthetic_formulation_data
+    from experiment_store import ExperimentStore
+
+    store = ExperimentStore(STORE_DIR)
+    with _store_lock(store.root):
+        # Each table is seeded on its own, so a start interrupted between the two only
+        # writes the missing one; the notes come from the same deterministic formulations.
+        _seed_table(store, "formulations", lambda: generate_synthetic_formulation_data(n=1200, seed=7))
+        _seed_table(store, "dev_notes", lambda: generate_synthetic_dev_notes(
+            generate_synthetic_formulation_data(n=1200, seed=7), n_notes=200, seed=11))
+    # The evidence pack export carries every formulation column, so that table is read in
+    # full; the notes only need what the NotesIndex filters on.
+    return (store.read("formulations"),
+            store.read("dev_notes", columns=["note_id", "exp_id", "observation", "review_status"]))
+
+
+def _models():
+    from model_registry import REGISTRY
+    return REGISTRY.get().preload()
+
+
+def _pool_cache():
+    # Scores the default candidate pool, so the first recommendation is a cache hit.
+    from agents import FormulationIntelligenceAgent
+    from pool_cache import ScoredPoolCache
+
+    wait("models")
+    cache = ScoredPoolCache()
+    cache.pool(FormulationIntelligenceAgent())
+    return cache
+
+
+def _notes_index():
+    from notes_index import NotesIndex
+    return NotesIndex(wait("data")[1])
+
+
+STEPS = {
+    "imports": _imports,
+    "data": _data,
+    "models": _models,
+    "pool_cache": _pool_cache,
+    "notes_index": _notes_index,
+}
+_step_locks = {name: threading.Lock() for name in STEPS}
+
+
+def _record(name, start, seconds, thread):
+    with _phase_lock:
+        PHASES.setdefault(name, {"start": start - T0, "seconds": seconds, "thread": thread})
+    from tracing import record
+    record(f"startup.{name}", seconds, thread=thread)
+
+
+def wait(name):
+    with _step_locks[name]:
+        if name not in _results:
+            start = time.perf_counter()
+            _results[name] = STEPS[name]()
+            thread = "background" if threading.current_thread() is _thread else "foreground"
+            _record(name, start, time.perf_counter() - start, thread)
+    return _results[name]
+
+
+def _run():
+    for name in STEPS:
+        try:
+            wait(name)
+        except Exception as exc:
+            # Left for the foreground to retry, where the error surfaces in the app.
+            print(f"startup: {name} failed in background: {exc!r}", file=sys.stderr)
+            return
+
+
+def start() -> None:
+    global _thread
+    if not PRELOAD:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="startup-preload", daemon=True)
+            _thread.start()
+
+
+def mark(name) -> None:
+    # Records a milestone (e.g. first paint) the first time it is reached in this process.
+    if name not in PHASES:
+        _record(name, T0, time.perf_counter() - T0, "foreground")
+
+
+def phases() -> list:
+    with _phase_lock:
+        return [{"phase": name, **p} for name, p in PHASES.items()]
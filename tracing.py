@@ -0,0 +1,184 @@
+"""Low-overhead timing spans for the hot paths.
+
+Tracing is off unless ``enable()`` is called or ``AGENTIC_TRACE`` is set (to ``1`` or to a
+JSON-lines output path). While it is off, ``span()`` returns a shared no-op object, so an
+instrumented block costs one function call and a flag check. A capture (``start_capture``)
+records spans on its own thread only, without turning tracing on for the process.
+
+    with span("orchestrate", rows=len(df), policy=policy):
+        ...
+
+Finished spans are appended to the JSON-lines file (if any), kept in a bounded in-memory
+buffer while tracing is enabled, and added to any capture active on the current thread
+(used by the app to show a per-rerun breakdown).
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+
+_enabled = False
+_sink = None
+_sink_lock = threading.Lock()
+_recent = deque(maxlen=10_000)
+_local = threading.local()
+_capturing = 0  # captures open on any thread
+
+
+def enabled() -> bool:
+    # True where spans are recorded: everywhere once enabled, else on capturing threads.
+    return _enabled or (_capturing > 0 and bool(getattr(_local, "captures", None)))
+
+
+def enable(path=None) -> None:
+    global _enabled, _sink
+    with _sink_lock:
+        if path and (_sink is None or _sink.name != str(path)):
+            if _sink is not None:
+                _sink.close()
+            _sink = open(path, "a", buffering=1)
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _sink
+    with _sink_lock:
+        _enabled = False
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+
+
+def _emit(rec) -> None:
+    for cap in getattr(_local, "captures", ()):
+        cap.append(rec)
+    if not _enabled:
+        return
+    _recent.append(rec)
+    if _sink is not None:
+        line = json.dumps(rec, default=str)
+        with _sink_lock:
+            if _sink is not None:
+                _sink.write(line + "\n")
+
+
+def record(name, seconds, **attrs) -> None:
+    # For timings measured elsewhere (e.g. summed across worker threads).
+    if enabled():
+        stack = getattr(_local, "stack", None)
+        _emit({"name": name, "ms": float(seconds) * 1000, "ts": time.time(),
+               "parent": stack[-1] if stack else None, **attrs})
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "t0", "parent")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.t0) * 1000
+        _local.stack.pop()
+        rec = {"name": self.name, "ms": ms, "ts": time.time(), "parent": self.parent, **self.attrs}
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        _emit(rec)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    if not _enabled and (not _capturing or not getattr(_local, "captures", None)):
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name):
+    # Decorator for functions whose first argument is a frame; records rows=len(frame).
+    # The frame may be passed positionally or by keyword.
+    def wrap(fn):
+        first = next(iter(inspect.signature(fn).parameters))
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            frame = args[0] if args else kwargs.get(first)
+            with Span(name, {"rows": len(frame) if hasattr(frame, "__len__") else None}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+_capture_lock = threading.Lock()
+
+
+def start_capture() -> list:
+    # Collects every span finished on this thread until stop_capture(); spans on this
+    # thread are recorded even while tracing is disabled.
+    global _capturing
+    cap = []
+    if not hasattr(_local, "captures"):
+        _local.captures = []
+    _local.captures.append(cap)
+    with _capture_lock:
+        _capturing += 1
+    return cap
+
+
+def stop_capture(cap) -> list:
+    global _capturing
+    captures = getattr(_local, "captures", [])
+    for i, c in enumerate(captures):
+        if c is cap:
+            del captures[i]
+            with _capture_lock:
+                _capturing -= 1
+            break
+    return cap
+
+
+def stop_captures() -> None:
+    # Closes every capture open on this thread, e.g. one left by an interrupted rerun.
+    for cap in list(getattr(_local, "captures", ())):
+        stop_capture(cap)
+
+
+def recent() -> list:
+    return list(_recent)
+
+
+_env = os.environ.get("AGENTIC_TRACE")
+if _env:
+    enable(None if _env == "1" else _env)
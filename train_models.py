@@ -1,32 +1,294 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.metrics import mean_absolute_error, roc_auc_score
+from sklearn.metrics import brier_score_loss, mean_absolute_error, roc_auc_score
+from sklearn.tree._tree import NODE_DTYPE
 
 FEATURES = ["api_load","solvent_ratio","polymer_pct","surfactant_pct","ph","viscosity","process_temp","mix_time"]
 
-def train_all(data_path="synthetic_formulations.csv", out_dir="."):
-    df = pd.read_csv(data_path)
+# (target column, artifact file, estimator class, n_estimators)
+TARGET_SPECS = [
+    ("permeability_score", "model_perm.joblib", RandomForestRegressor, 250),
+    ("irritation_risk", "model_irr.joblib", RandomForestRegressor, 250),
+    ("stability_days", "model_stab.joblib", RandomForestRegressor, 250),
+    ("qc_fail", "model_fail.joblib", RandomForestClassifier, 350),
+]
+
+
+def atomic_dump(obj, path) -> int:
+    # Write next to the target and rename, so readers (and the model registry's
+    # change detection) never observe a half-written artifact.
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path.stat().st_size
+
+
+def data_version(df: pd.DataFrame) -> str:
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return f"{len(df)}-{digest.hexdigest()[:12]}"
+
+
+def chain_version(previous: str, delta_version: str) -> str:
+    # Version of a table after appending a delta: the row counts add up and the digest
+    # chains, so it identifies the base data together with every delta, in order.
+    rows = int(previous.split("-")[0]) + int(delta_version.split("-")[0])
+    digest = hashlib.sha1(f"{previous}+{delta_version}".encode())
+    return f"{rows}-{digest.hexdigest()[:12]}"
+
+
+def load_training_frame(data_path) -> pd.DataFrame:
+    # A directory is an experiment_store.ExperimentStore; only the columns the models
+    # need are read from it.
+    if Path(data_path).is_dir():
+        from experiment_store import ExperimentStore
+        columns = FEATURES + [spec[0] for spec in TARGET_SPECS]
+        return ExperimentStore(data_path).read("formulations", columns=columns)
+    return pd.read_csv(data_path)
+
+
+def _drift_error(m, X, y) -> float:
+    # Error used to compare a model on new rows against its holdout baseline:
+    # MAE for regressors, Brier score for the QC classifier.
+    if isinstance(m, RandomForestClassifier):
+        return brier_score_loss(y, m.predict_proba(X)[:,1])
+    return mean_absolute_error(y, m.predict(X))
+
+
+def read_manifest(out_dir) -> dict:
+    path = Path(out_dir) / "manifest.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def write_manifest(out_dir, manifest) -> None:
+    path = Path(out_dir) / "manifest.json"
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path)
+
+
+def forest_nbytes(forest) -> int:
+    return sum(e.tree_.value.nbytes + e.tree_.node_count * NODE_DTYPE.itemsize for e in forest.estimators_)
+
+
+def _fit_target(spec, X, y, idx_tr, idx_te, out_dir, n_jobs, params=None):
+    # params (from tuning.successive_halving) overrides the spec's n_estimators.
+    target, fname, cls, n_estimators = spec
+    params = params or {"n_estimators": n_estimators}
+    t0 = time.perf_counter()
+    m = cls(random_state=7, n_jobs=n_jobs, **params)
+    m.fit(X.iloc[idx_tr], y.iloc[idx_tr])
+    fit_seconds = time.perf_counter() - t0
+    m.n_jobs = None
+
+    if cls is RandomForestClassifier:
+        metric, value = "AUC", roc_auc_score(y.iloc[idx_te], m.predict_proba(X.iloc[idx_te])[:,1])
+    else:
+        metric, value = "MAE", mean_absolute_error(y.iloc[idx_te], m.predict(X.iloc[idx_te]))
+
+    artifact_bytes = atomic_dump(m, Path(out_dir) / fname)
+    return {
+        "target": target,
+        "artifact": fname,
+        "metric": metric,
+        "value": value,
+        "drift_baseline": _drift_error(m, X.iloc[idx_te], y.iloc[idx_te]),
+        "n_estimators": m.n_estimators,
+        "params": params,
+        "n_nodes": sum(e.tree_.node_count for e in m.estimators_),
+        "fit_seconds": fit_seconds,
+        "total_seconds": time.perf_counter() - t0,
+        "model": m,
+        "model_bytes": forest_nbytes(m),
+        "artifact_bytes": artifact_bytes,
+    }
+
+
+def train_all(data_path="synthetic_formulations.csv", out_dir=".", n_jobs=None,
+              tune=False, tolerance=0.02, params=None):
+    # The split is computed once and shared; train_test_split on the row positions yields
+    # the same partition as splitting (X, y) per target. The four targets are fitted
+    # concurrently and the available cores are divided between their tree builders.
+    # tune=True first picks each target's forest size, depth and leaf size by successive
+    # halving on the training rows (the holdout is untouched): the cheapest-to-predict
+    # configuration whose CV MAE / AUC is within `tolerance` of the best one. params
+    # (target -> estimator params) reuses earlier choices without searching again.
+    t0 = time.perf_counter()
+    df = load_training_frame(data_path)
     X = df[FEATURES]
+    idx_tr, idx_te = train_test_split(np.arange(len(df)), test_size=0.2, random_state=7)
+
+    cores = n_jobs or os.cpu_count() or 1
+    params, tuning = dict(params or {}), {}
+    if tune:
+        from tuning import successive_halving
+        for target, _, cls, _ in TARGET_SPECS:
+            result = successive_halving(cls, X.iloc[idx_tr], df[target].iloc[idx_tr],
+                                        tolerance=tolerance, n_jobs=cores)
+            params[target] = result["params"]
+            tuning[target] = {k: v for k, v in result.items() if k != "history"}
+            print(f"{target}: {result['params']} CV {result['cv_score']:.3f} "
+                  f"(best {result['best_cv_score']:.3f}, {result['evaluated']} fits)")
+    workers = min(len(TARGET_SPECS), cores)
+    per_forest = max(1, -(-cores // workers))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_fit_target, spec, X, df[spec[0]], idx_tr, idx_te, out_dir, per_forest,
+                        params.get(spec[0]))
+            for spec in TARGET_SPECS
+        ]
+        report = [f.result() for f in futures]
+
+    # Prediction latency is timed here, one target at a time, so no fit competes for cores.
+    X_te = X.iloc[idx_te]
+    for r in report:
+        m = r.pop("model")
+        t1 = time.perf_counter()
+        m.predict_proba(X_te) if isinstance(m, RandomForestClassifier) else m.predict(X_te)
+        r["predict_us_per_row"] = (time.perf_counter() - t1) / max(len(idx_te), 1) * 1e6
+
+    version = data_version(df)
+    write_manifest(out_dir, {
+        "data_version": version,
+        "targets": {
+            r["target"]: {
+                "artifact": r["artifact"],
+                "metric": r["metric"],
+                "value": r["value"],
+                "drift_baseline": r["drift_baseline"],
+                "n_estimators": r["n_estimators"],
+                "params": r["params"],
+                "rows": len(idx_tr),
+                "data_version": version,
+                "trained_on": [version],
+            }
+            for r in report
+        },
+        **({"tuning": tuning} if tune else {}),
+    })
+
+    for r in report:
+        print(f"{r['target']} {r['metric']}: {r['value']:.3f}")
+    print(
+        f"trained {len(report)} targets in {time.perf_counter() - t0:.1f}s on {cores} cores; "
+        f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"
+    )
+    return pd.DataFrame(report)
+
+
+def update_models(new_rows, out_dir=".", data_path=None, trees_per_update=None,
+                  max_trees=None, drift_threshold=1.5):
+    # Extends each existing forest with trees fitted on the new rows only, so the cost
+    # follows the size of the delta. trees_per_update defaults to the forest's share of
+    # trees for the delta (at least 10); max_trees keeps a sliding window by dropping the
+    # oldest trees. If any model's error on the new rows exceeds drift_threshold times its
+    # holdout baseline, everything is retrained from data_path (the full, appended table).
+    delta = load_training_frame(new_rows) if isinstance(new_rows, (str, Path)) else new_rows
+    manifest = read_manifest(out_dir)
+    if not manifest:
+        raise FileNotFoundError(f"no manifest.json in {out_dir}; run train_all first")
+    version = data_version(delta)
+    X = delta[FEATURES]
+
+    forests, drift = {}, {}
+    for target, fname, cls, _ in TARGET_SPECS:
+        m = joblib.load(Path(out_dir) / fname)
+        forests[target] = m
+        drift[target] = _drift_error(m, X, delta[target]) / manifest["targets"][target]["drift_baseline"]
+
+    drifted = {t: r for t, r in drift.items() if r > drift_threshold}
+    if drifted:
+        if data_path is None:
+            raise ValueError(f"drift above {drift_threshold} for {sorted(drifted)}; pass data_path to retrain")
+        print(f"drift {drifted} above {drift_threshold}; full retrain")
+        return train_all(data_path, out_dir,
+                         params={t: e.get("params") for t, e in manifest["targets"].items()})
+
+    report = []
+    for seq, (target, fname, cls, n_estimators) in enumerate(TARGET_SPECS):
+        m, entry = forests[target], manifest["targets"][target]
+        y = delta[target]
+        t0 = time.perf_counter()
+        if cls is RandomForestClassifier and y.nunique() < len(m.classes_):
+            # Trees fitted without every class cannot be averaged with the existing ones.
+            report.append({"target": target, "added": 0, "dropped": 0, "drift": drift[target],
+                           "seconds": 0.0, "skipped": "delta lacks a class"})
+            continue
+
+        # New trees share the (possibly tuned) depth and leaf settings of the forest.
+        params = dict(entry.get("params") or {"n_estimators": n_estimators})
+        k = trees_per_update or max(10, round(params.pop("n_estimators") * len(delta) / entry["rows"]))
+        extra = cls(n_estimators=k, random_state=7 + len(entry["trained_on"]) * len(TARGET_SPECS) + seq,
+                    **params)
+        extra.fit(X, y)
+        m.estimators_ += extra.estimators_
+        dropped = 0
+        if max_trees and len(m.estimators_) > max_trees:
+            dropped = len(m.estimators_) - max_trees
+            m.estimators_ = m.estimators_[dropped:]
+        m.n_estimators = len(m.estimators_)
+        atomic_dump(m, Path(out_dir) / fname)
+
+        entry["n_estimators"] = m.n_estimators
+        entry["rows"] += len(delta)
+        if "data_version" not in entry:  # manifests written before per-target versions
+            entry["data_version"] = functools.reduce(chain_version, entry["trained_on"])
+        entry["trained_on"].append(version)
+        entry["data_version"] = chain_version(entry["data_version"], version)
+        report.append({"target": target, "added": k, "dropped": dropped, "drift": drift[target],
+                       "seconds": time.perf_counter() - t0, "skipped": None})
+
+    # Top level: the table the artifacts were trained from, base plus every appended delta.
+    # A target that skipped a delta keeps its own, older data_version.
+    manifest["data_version"] = chain_version(manifest["data_version"], version)
+    write_manifest(out_dir, manifest)
+    return pd.DataFrame(report)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Train the four formulation models.")
+    p.add_argument("--data", default="synthetic_formulations.csv",
+                   help="formulations CSV or experiment store directory")
+    p.add_argument("--out-dir", default=".")
+    p.add_argument("--n-jobs", type=int, default=None)
+    p.add_argument("--update", metavar="NEW_ROWS_CSV",
+                   help="extend the existing models with these rows instead of retraining")
+    p.add_argument("--max-trees", type=int, default=None)
+    p.add_argument("--drift-threshold", type=float, default=1.5)
+    p.add_argument("--tune", action="store_true",
+                   help="search forest size, depth and leaf size per target by successive halving")
+    p.add_argument("--tolerance", type=float, default=0.02,
+                   help="relative MAE / AUC loss accepted for a faster model when tuning")
+    args = p.parse_args(argv)
+    if args.update:
+        report = update_models(args.update, args.out_dir, data_path=args.data,
+                               max_trees=args.max_trees, drift_threshold=args.drift_threshold)
+        print(report.to_string(index=False))
+        return
+    report = train_all(args.data, args.out_dir, n_jobs=args.n_jobs, tune=args.tune, tolerance=args.tolerance)
+    print(report.drop(columns=["artifact", "params"]).assign(
+        params=report["params"].map(lambda p: " ".join(f"{k}={v}" for k, v in p.items()))
+    ).to_string(index=False))
+
 
-    for target, fname in [
-        ("permeability_score","model_perm.joblib"),
-        ("irritation_risk","model_irr.joblib"),
-        ("stability_days","model_stab.joblib"),
-    ]:
-        y = df[target]
-        Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=7)
-        m = RandomForestRegressor(n_estimators=250, random_state=7)
-        m.fit(Xtr, ytr)
-        mae = mean_absolute_error(yte, m.predict(Xte))
-        joblib.dump(m, f"{out_dir}/{fname}")
-        print(f"{target} MAE: {mae:.3f}")
-
-    y = df["qc_fail"]
-    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=7)
-    clf = RandomForestClassifier(n_estimators=350, random_state=7)
-    clf.fit(Xtr, ytr)
-    auc = roc_auc_score(yte, clf.predict_proba(Xte)[:,1])
-    joblib.dump(clf, f"{out_dir}/model_fail.joblib")
-    print(f"qc_fail AUC: {auc:.3f}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Successive-halving search for small, fast forests.
+
+Every configuration in ``SEARCH_SPACE`` is fitted on cached cross-validation folds of the
+training rows, first on a small subsample of each fold and then, for the survivors, on
+``eta`` times more rows per round until the full folds are used. A round keeps the
+cheapest configurations whose score is within ``tolerance`` (relative) of the round's
+best, topped up by score, so large forests only survive while the small ones are clearly
+worse. The final pick is the cheapest survivor within tolerance of the best.
+
+Cost is the prediction work of a fitted forest, sum over trees of ``tree_.max_depth``
+(the longest root-to-leaf path each row may walk). It is deterministic, unlike wall-clock
+timings taken while other configurations fit on the same cores.
+"""
+import itertools
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import mean_absolute_error, roc_auc_score
+from sklearn.model_selection import KFold, StratifiedKFold
+
+SEARCH_SPACE = {
+    "n_estimators": [25, 50, 100, 200, 350],
+    "max_depth": [6, 10, 14, None],
+    "min_samples_leaf": [1, 3, 5, 10],
+}
+
+
+def configurations(space=SEARCH_SPACE) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def cached_folds(y, classifier, n_folds=3, seed=7) -> list:
+    # (train positions, validation positions) per fold; the train positions are shuffled
+    # once so every round's subsample is a prefix of them.
+    cv = StratifiedKFold if classifier else KFold
+    rng = np.random.default_rng(seed)
+    folds = cv(n_splits=n_folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y)
+    return [(rng.permutation(tr), va) for tr, va in folds]
+
+
+class _Evaluator:
+    def __init__(self, cls, X, y, folds):
+        self.cls = cls
+        self.X = np.ascontiguousarray(X, dtype=np.float32)
+        self.y = np.asarray(y)
+        self.folds = folds
+        self.classifier = cls is RandomForestClassifier
+
+    def score(self, m, va):
+        if self.classifier:
+            return roc_auc_score(self.y[va], m.predict_proba(self.X[va])[:, 1])
+        return mean_absolute_error(self.y[va], m.predict(self.X[va]))
+
+    def __call__(self, params, rows):
+        # Mean CV score and mean cost of one configuration on `rows` training rows per fold.
+        scores, cost = [], []
+        for tr, va in self.folds:
+            m = self.cls(random_state=7, n_jobs=1, **params)
+            m.fit(self.X[tr[:rows]], self.y[tr[:rows]])
+            scores.append(self.score(m, va))
+            cost.append(sum(e.tree_.max_depth for e in m.estimators_))
+        return float(np.mean(scores)), float(np.mean(cost))
+
+
+def within(score, best, tolerance, classifier) -> bool:
+    # AUC is maximized, MAE minimized.
+    if classifier:
+        return score >= best * (1 - tolerance)
+    return score <= best * (1 + tolerance)
+
+
+def successive_halving(cls, X, y, tolerance=0.02, eta=3, min_rows=200, n_folds=3,
+                       space=SEARCH_SPACE, n_jobs=None) -> dict:
+    classifier = cls is RandomForestClassifier
+    evaluate = _Evaluator(cls, X, y, cached_folds(y, classifier, n_folds))
+    full = min(len(tr) for tr, _ in evaluate.folds)
+    configs = configurations(space)
+    n_rounds = max(1, min(math.ceil(math.log(len(configs), eta)), int(math.log(full / min_rows, eta)) + 1))
+    rows = max(min_rows, full // eta ** (n_rounds - 1))
+
+    history = []
+    pool = ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1)
+    try:
+        for rnd in range(n_rounds):
+            rows = full if rnd == n_rounds - 1 else min(rows, full)
+            results = list(pool.map(lambda params: evaluate(params, rows), configs))
+            scores = np.array([s for s, _ in results])
+            cost = np.array([t for _, t in results])
+            history.extend(
+                {"round": rnd, "rows": rows, **params, "score": s, "cost": t}
+                for params, (s, t) in zip(configs, results)
+            )
+            best = scores.max() if classifier else scores.min()
+            ok = np.array([within(s, best, tolerance, classifier) for s in scores])
+            if rnd == n_rounds - 1:
+                break
+            # Cheapest adequate configurations first, then the rest by score; the round's
+            # best always survives.
+            by_score = np.argsort(-scores if classifier else scores, kind="stable")
+            order = np.concatenate([np.flatnonzero(ok)[np.argsort(cost[ok], kind="stable")],
+                                    by_score[~ok[by_score]]])
+            keep = list(order[:max(1, math.ceil(len(configs) / eta))])
+            if by_score[0] not in keep:
+                keep[-1] = by_score[0]
+            configs = [configs[i] for i in keep]
+            rows *= eta
+    finally:
+        pool.shutdown()
+
+    chosen = int(np.flatnonzero(ok)[np.argmin(cost[ok])])
+    return {
+        "params": configs[chosen],
+        "cv_score": float(scores[chosen]),
+        "best_cv_score": float(best),
+        "cv_cost": float(cost[chosen]),
+        "evaluated": len(history),
+        "history": history,
+    }